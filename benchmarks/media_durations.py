@@ -0,0 +1,53 @@
+"""
+Compares the time taken to compute durations of wav files by reading their headers and by probing them with ffprobe.
+
+Usage: python benchmarks/media_durations.py [number of files]
+"""
+
+import shutil
+import sys
+import tempfile
+import time
+import wave
+from collections.abc import Callable
+from pathlib import Path
+
+from son.media import MediaInfo, probe_media_info, read_wav_info
+
+
+def create_wav_files(directory: Path, count: int) -> list[Path]:
+    paths = []
+    for index in range(count):
+        path = directory / f'song-{index}.wav'
+        with wave.open(str(path), 'wb') as file:
+            file.setnchannels(2)
+            file.setsampwidth(2)
+            file.setframerate(44100)
+            file.writeframes(bytes(4 * 44100))
+        paths.append(path)
+    return paths
+
+
+def measure(name: str, get_info: Callable[[Path], MediaInfo | None], paths: list[Path]) -> float:
+    start = time.perf_counter()
+    for path in paths:
+        get_info(path)
+    elapsed = time.perf_counter() - start
+    print(f'{name}: {elapsed * 1000:.1f} ms for {len(paths)} files, {elapsed / len(paths) * 1e6:.0f} µs per file')
+    return elapsed
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    with tempfile.TemporaryDirectory() as directory:
+        paths = create_wav_files(Path(directory), count)
+        header_time = measure('wav headers', read_wav_info, paths)
+        if shutil.which('ffprobe') is None:
+            print('ffprobe is not installed, the probing path is not measured')
+            return
+        probe_time = measure('ffprobe', probe_media_info, paths)
+        print(f'reading wav headers is {probe_time / header_time:.0f} times faster')
+
+
+if __name__ == '__main__':
+    main()
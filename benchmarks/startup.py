@@ -0,0 +1,43 @@
+"""
+Measures the start-up time of son commands, from the process start to the validation of their arguments.
+
+The commands are given invalid arguments, so they exit as soon as click checks them, without converting or playing
+anything.
+
+Usage, from the repository root: python benchmarks/startup.py [number of runs]
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+COMMANDS = (['to-wav', '--jobs', '0', 'song.mp3'], ['play', 'missing.wav'])
+SON = 'import sys; sys.argv[0] = "son"; from son.main import cli; cli()'
+
+
+def measure(args: list[str], runs: int, environment: dict[str, str]) -> float:
+    """Returns the median duration in seconds of "son <args>"."""
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(  # noqa: S603
+            [sys.executable, '-c', SON, *args], env=environment, capture_output=True, check=False
+        )
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations)
+
+
+def main() -> None:
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    with tempfile.TemporaryDirectory() as directory:
+        # a fresh data directory, the database is created by the first command needing it
+        environment = {**os.environ, 'XDG_DATA_HOME': directory, 'XDG_CACHE_HOME': directory}
+        for args in COMMANDS:
+            print(f'son {" ".join(args)}: {measure(args, runs, environment) * 1000:.0f} ms (median of {runs} runs)')
+
+
+if __name__ == '__main__':
+    main()
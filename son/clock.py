@@ -0,0 +1,34 @@
+import time
+from collections.abc import Callable, Iterator
+
+Clock = Callable[[], float]
+Sleep = Callable[[float], None]
+
+
+def sleep_until(deadline: float, clock: Clock = time.monotonic, sleep: Sleep = time.sleep) -> None:
+    """Sleeps until the deadline, a value of the given clock (time.monotonic by default)."""
+    while (remaining := deadline - clock()) > 0:
+        sleep(remaining)
+
+
+def countdown(
+    deadline: float, interval: float | None = 1, clock: Clock = time.monotonic, sleep: Sleep = time.sleep
+) -> Iterator[float]:
+    """
+    Yields the time remaining before the deadline every "interval" seconds, and 0 once the deadline is reached.
+
+    Ticks are scheduled from the start time and not from the previous tick, so the time spent by the caller between
+    two ticks does not make the countdown drift. Ticks missed because the caller was too slow are skipped. If interval
+    is None, there is no tick between the start and the deadline.
+    """
+    start = clock()
+    tick = 0
+    while (remaining := deadline - clock()) > 0:
+        yield remaining
+        if interval is None:
+            next_tick = deadline
+        else:
+            tick = max(tick + 1, int((clock() - start) / interval) + 1)
+            next_tick = min(start + tick * interval, deadline)
+        sleep_until(next_tick, clock, sleep)
+    yield 0
@@ -0,0 +1,79 @@
+from typing import TYPE_CHECKING
+
+import click
+
+from son.console import console
+
+if TYPE_CHECKING:
+    from son.main import Container
+
+
+@click.group()
+def cache():
+    """
+    Manages the media information and conversion caches.
+    """
+
+
+@cache.command()
+@click.pass_obj
+def stats(obj: 'Container'):
+    """
+    Shows media and conversion cache statistics.
+
+    Example usage:
+
+    $ son cache stats
+    """
+    media_cache = obj.media_cache
+    statistics = media_cache.stats()
+    lookups = statistics['hits'] + statistics['misses']
+    hit_rate = statistics['hits'] / lookups * 100 if lookups else 0
+    console.print(f'[label]path[/]     : {media_cache.path}', highlight=False)
+    console.print(f'[label]entries[/]  : {statistics["entries"]} / {media_cache.max_entries}')
+    console.print(f'[label]hits[/]     : {statistics["hits"]}')
+    console.print(f'[label]misses[/]   : {statistics["misses"]}')
+    console.print(f'[label]hit rate[/] : {hit_rate:.1f}%')
+
+    conversion_cache = obj.conversion_cache
+    statistics = conversion_cache.stats()
+    console.print()
+    console.print(f'[label]conversions path[/] : {conversion_cache.directory}', highlight=False)
+    console.print(f'[label]entries[/]          : {statistics["entries"]}')
+    size, max_size = statistics['size'] / 1024**2, conversion_cache.max_size / 1024**2
+    console.print(f'[label]size[/]             : {size:.1f} / {max_size:.0f} MB')
+
+
+@cache.command()
+@click.option(
+    '--all', 'clear_all', is_flag=True, default=False, help='Removes all entries and resets media cache statistics.'
+)
+@click.pass_obj
+def prune(obj: 'Container', clear_all: bool):
+    """
+    Removes stale entries from the media and conversion caches.
+
+    An entry is stale when its file was deleted or modified. Least recently used entries exceeding the maximum cache
+    sizes (SON_MEDIA_CACHE_SIZE and SON_CONVERSION_CACHE_SIZE environment variables) are removed too.
+
+    Example usage:
+
+    \b
+    # removes stale entries
+    $ son cache prune
+
+    \b
+    # removes all entries
+    $ son cache prune --all
+    """
+    media_cache = obj.media_cache
+    conversion_cache = obj.conversion_cache
+    if clear_all:
+        count = media_cache.clear()
+        conversion_count = conversion_cache.clear()
+    else:
+        count = media_cache.prune() + media_cache.evict()
+        # entries of modified files are never used again, they are the least recently used ones
+        conversion_count = conversion_cache.evict()
+    console.print(f'[success]{count} entries removed from the media cache.')
+    console.print(f'[success]{conversion_count} files removed from the conversion cache.')
@@ -0,0 +1,31 @@
+import importlib
+
+import click
+
+
+class LazyGroup(click.Group):
+    """
+    A click group importing the module of a subcommand only when this subcommand is needed.
+
+    Subcommands are given as a mapping of command names to "module:attribute" import paths. This keeps the start-up
+    of the command line (and shell completion) fast since heavy dependencies are only imported by commands using them.
+    """
+
+    def __init__(self, *args, lazy_subcommands: dict[str, str] | None = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lazy_subcommands = lazy_subcommands or {}
+
+    def list_commands(self, ctx: click.Context) -> list[str]:
+        return sorted([*super().list_commands(ctx), *self.lazy_subcommands])
+
+    def get_command(self, ctx: click.Context, cmd_name: str) -> click.Command | None:
+        if cmd_name in self.lazy_subcommands:
+            return self._load_command(cmd_name)
+        return super().get_command(ctx, cmd_name)
+
+    def _load_command(self, cmd_name: str) -> click.Command:
+        module_name, attribute = self.lazy_subcommands[cmd_name].split(':')
+        command = getattr(importlib.import_module(module_name), attribute)
+        if not isinstance(command, click.Command):
+            raise TypeError(f'{self.lazy_subcommands[cmd_name]} is not a click command')
+        return command
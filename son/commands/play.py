@@ -1,11 +1,11 @@
+import time
 from pathlib import Path
 from typing import TYPE_CHECKING
 
 import click
-import nava
 
 from son.console import show_play_progress
-from son.media import get_compatible_nava_file_or_raise_error, get_media_duration
+from son.media import get_compatible_nava_file_or_raise_error, get_media_info, is_nava_compatible
 
 if TYPE_CHECKING:
     from son.main import Container
@@ -14,14 +14,21 @@ if TYPE_CHECKING:
 @click.command()
 @click.argument('sound', type=click.Path(exists=True, dir_okay=False, path_type=Path))
 @click.option('--loop', is_flag=True, help='Loop the audio file.')
+@click.option(
+    '--keep-wav',
+    is_flag=True,
+    help='When SOUND is converted, keep a wav copy in the same directory instead of decoding it on the fly.',
+)
 @click.pass_obj
-def play(obj: 'Container', sound: Path, loop: bool):
+def play(obj: 'Container', sound: Path, loop: bool, keep_wav: bool):
     """
     Plays SOUND wav file passed as input.
 
-    If SOUND is not a wav file, a copy with the wav format will be automatically created in the same directory if
-    "auto_conversion" setting is set to true. You can control this setting with the environment variable
-    SON_AUTO_CONVERSION. Values "true", "yes", "on" mean true and values "false", "no", "off" mean false.
+    If SOUND is not a wav file, it will be automatically converted if "auto_conversion" setting is set to true. You can
+    control this setting with the environment variable SON_AUTO_CONVERSION. Values "true", "yes", "on" mean true and
+    values "false", "no", "off" mean false. When possible, the file is decoded while it is played, otherwise it is
+    converted once and stored in the son cache directory. With the --keep-wav option, a copy with the wav format is
+    created in the same directory instead.
 
     \b
     Arguments:
@@ -34,15 +41,42 @@ def play(obj: 'Container', sound: Path, loop: bool):
     \b
     # to play in loop
     $ son play audio.wav --loop
+
+    \b
+    # to play a mp3 file and keep its wav conversion
+    $ son play audio.mp3 --keep-wav
     """
-    sound = get_compatible_nava_file_or_raise_error(sound, obj.settings)
+    import nava
+
+    from son.playback import TranscodingStream, can_stream
+
+    if not is_nava_compatible(sound) and obj.settings.auto_conversion and not keep_wav and can_stream():
+        stream = TranscodingStream(sound, loop)
+        stream.start()
+        try:
+            show_sound_progress(obj, sound, loop)
+        finally:
+            stream.stop()
+        return
+
+    # the user asked for a copy next to the file, otherwise it is stored in the conversion cache
+    conversion_cache = None if keep_wav else obj.conversion_cache
+    sound = get_compatible_nava_file_or_raise_error(sound, obj.settings, conversion_cache)
     # Note: nava doesn't play in async mode without a sleep time,
     # in our case the sleep resides inside the function showing the progress bar
     sound_id = nava.play(str(sound), async_mode=True, loop=loop)
-    sound_duration = get_media_duration(sound)
+    show_sound_progress(obj, sound, loop)
+    nava.stop(sound_id)
+
+
+def show_sound_progress(obj: 'Container', sound: Path, loop: bool) -> None:
+    sound_duration = get_media_info(sound, obj.media_cache).duration
+    refresh_rate = obj.settings.refresh_rate
     if loop:
+        # deadlines follow each other, so the progress bar stays in sync with the sound loop
+        deadline = time.monotonic()
         while True:
-            show_play_progress(sound_duration, f'[bold]{sound}[/]', transient=True)
+            deadline += sound_duration
+            show_play_progress(sound_duration, f'[bold]{sound}[/]', True, deadline, refresh_rate)
     else:
-        show_play_progress(sound_duration, f'[bold]{sound}[/]')
-    nava.stop(sound_id)
+        show_play_progress(sound_duration, f'[bold]{sound}[/]', refresh_rate=refresh_rate)
@@ -1,22 +1,28 @@
 import click
 
-from .add_songs import add_songs
-from .clear import clear
-from .create import create
-from .delete import delete
-from .describe import describe
-from .list import list_playlists
-from .play import play
-from .remove_songs import remove_songs
-from .rename import rename
+from son.commands.lazy import LazyGroup
 
 
-@click.group()
+# Shell completion loads the command of the argument being completed, and every command of the group to show their
+# short help when a command name is completed. This is why commands import database, playback and prompt related
+# modules in their body: completion reads flat index files and must stay fast.
+@click.group(
+    cls=LazyGroup,
+    lazy_subcommands={
+        'add-songs': 'son.commands.playlist.add_songs:add_songs',
+        'check': 'son.commands.playlist.check:check',
+        'clear': 'son.commands.playlist.clear:clear',
+        'create': 'son.commands.playlist.create:create',
+        'delete': 'son.commands.playlist.delete:delete',
+        'describe': 'son.commands.playlist.describe:describe',
+        'list': 'son.commands.playlist.list:list_playlists',
+        'play': 'son.commands.playlist.play:play',
+        'rm-songs': 'son.commands.playlist.remove_songs:remove_songs',
+        'rename': 'son.commands.playlist.rename:rename',
+        'sync': 'son.commands.playlist.sync:sync',
+    },
+)
 def playlist():
     """
     Manages audio playlists.
     """
-
-
-for command in [create, list_playlists, delete, clear, describe, rename, add_songs, remove_songs, play]:
-    playlist.add_command(command)
@@ -3,18 +3,14 @@ from typing import TYPE_CHECKING
 
 import click
 
-from son.commands.playlist.utils import (
-    add_songs_and_folders,
-    add_songs_and_folders_interactively,
-    get_playlist_or_raise_error,
-)
+from son.completion_index import complete_playlist_names
 
 if TYPE_CHECKING:
     from son.main import Container
 
 
 @click.command()
-@click.argument('name')
+@click.argument('name', shell_complete=complete_playlist_names)
 @click.option(
     '-s',
     '--song',
@@ -29,7 +25,8 @@ if TYPE_CHECKING:
     'song_folders',
     multiple=True,
     type=click.Path(exists=True, file_okay=False, path_type=Path),
-    help='Folder containing songs to add to the playlist. Only ".wav" files will be found and added.',
+    help='Folder containing songs to add to the playlist, subfolders included. Only ".wav" and ".wave" files'
+    ' (whatever their case) will be found and added.',
 )
 @click.option(
     '-i', '--interactive', is_flag=True, default=False, help='Choose songs to add from the file explorer input.'
@@ -61,9 +58,13 @@ def add_songs(obj: 'Container', name: str, songs: tuple[Path], song_folders: tup
     # adds songs interactively
     $ son playlist add-songs my-playlist -i
     """
+    from son.commands.playlist.queries import get_playlist_or_raise_error, update_completion_index
+    from son.commands.playlist.utils import add_songs_and_folders, add_songs_and_folders_interactively
+
     with obj.db.Session() as session:
         playlist = get_playlist_or_raise_error(name, session)
-        add_songs_and_folders(obj.db, playlist.id, songs, song_folders)
+        add_songs_and_folders(obj, playlist.id, songs, song_folders)
 
     if interactive:
-        add_songs_and_folders_interactively(obj.db, playlist.id)
+        add_songs_and_folders_interactively(obj, playlist.id)
+    update_completion_index(obj, [name])
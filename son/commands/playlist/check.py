@@ -0,0 +1,50 @@
+from typing import TYPE_CHECKING
+
+import click
+
+from son.console import console, error_console
+
+if TYPE_CHECKING:
+    from son.main import Container
+
+
+@click.command()
+@click.option('-r', '--repair', is_flag=True, help='Recomputes the song count and total duration of playlists.')
+@click.pass_obj
+def check(obj: 'Container', repair: bool):
+    """
+    Checks the song count and total duration stored for each playlist.
+
+    These totals are kept up to date by the database on each change of the playlist songs, this command compares them
+    with the songs of each playlist and reports the playlists where they differ.
+
+    Example usage:
+
+    \b
+    # reports playlists with wrong totals
+    $ son playlist check
+
+    \b
+    # fixes the totals of all playlists
+    $ son playlist check --repair
+    """
+    from son.commands.playlist.queries import get_inconsistent_playlists, repair_playlist_aggregates
+    from son.commands.playlist.utils import print_table
+
+    with obj.db.Session() as session:
+        rows = get_inconsistent_playlists(session)
+    if not rows:
+        console.print('[success]All playlist totals are consistent. :glowing_star:')
+        return
+
+    print_table(
+        'Inconsistent playlists',
+        ('name', 'songs', 'actual songs', 'duration', 'actual duration'),
+        ((row[0], *(str(value) for value in row[1:])) for row in rows),
+    )
+    if not repair:
+        error_console.print(f'[error]{len(rows)} playlist(s) have wrong totals, use the [bold]--repair[/] option.')
+        raise SystemExit(1)
+
+    repair_playlist_aggregates(obj)
+    console.print(f'[success]Repaired totals of {len(rows)} playlist(s).')
@@ -2,8 +2,8 @@ from typing import TYPE_CHECKING
 
 import click
 
+from son.completion_index import clear_index
 from son.console import console
-from son.database import Playlist, Song
 
 if TYPE_CHECKING:
     from son.main import Container
@@ -13,8 +13,9 @@ if TYPE_CHECKING:
 @click.pass_obj
 def clear(obj: 'Container'):
     """Clears the playlist database."""
-    with obj.db.begin() as session:
-        session.execute(Playlist.delete())
-        session.execute(Song.delete())
+    from son.commands.playlist.queries import clear_playlists
+
+    clear_playlists(obj)
+    clear_index(obj.data_dir)
 
     console.print('[success]Database cleared.')
@@ -2,29 +2,13 @@ from pathlib import Path
 from typing import TYPE_CHECKING
 
 import click
-from alchemical import Alchemical
-from sqlalchemy.exc import IntegrityError
 
-from son.commands.playlist.utils import add_songs_and_folders, add_songs_and_folders_interactively
-from son.console import console, error_console
-from son.database import Playlist
+from son.console import console
 
 if TYPE_CHECKING:
     from son.main import Container
 
 
-def create_playlist(name: str, db: Alchemical) -> int:
-    try:
-        with db.begin() as session:
-            playlist = Playlist(name=name)
-            session.add(playlist)
-            session.flush()
-            return playlist.id
-    except IntegrityError:
-        error_console.print(f'[error]Playlist [bold]{name}[/] already exists.')
-        raise SystemExit(1) from None
-
-
 @click.command()
 @click.argument('name')
 @click.option(
@@ -41,7 +25,8 @@ def create_playlist(name: str, db: Alchemical) -> int:
     'song_folders',
     multiple=True,
     type=click.Path(exists=True, file_okay=False, path_type=Path),
-    help='Folder containing songs to add to the playlist. Only ".wav" files will be found and added.',
+    help='Folder containing songs to add to the playlist, subfolders included. Only ".wav" and ".wave" files'
+    ' (whatever their case) will be found and added.',
 )
 @click.option(
     '-i', '--interactive', is_flag=True, default=False, help='Choose songs to add from the file explorer input.'
@@ -73,9 +58,13 @@ def create(obj: 'Container', name: str, songs: tuple[Path], song_folders: tuple[
     # create a playlist with songs added interactively
     $ son playlist create my-playlist -i
     """
+    from son.commands.playlist.queries import create_playlist, update_completion_index
+    from son.commands.playlist.utils import add_songs_and_folders, add_songs_and_folders_interactively
+
     playlist_id = create_playlist(name, obj.db)
     console.print(f'[success]Playlist [bold]{name}[/] created. :glowing_star:')
 
-    add_songs_and_folders(obj.db, playlist_id, songs, song_folders)
+    add_songs_and_folders(obj, playlist_id, songs, song_folders)
     if interactive:
-        add_songs_and_folders_interactively(obj.db, playlist_id)
+        add_songs_and_folders_interactively(obj, playlist_id)
+    update_completion_index(obj, [name])
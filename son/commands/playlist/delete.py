@@ -2,7 +2,7 @@ from typing import TYPE_CHECKING
 
 import click
 
-from son.commands.playlist.utils import get_playlist_or_raise_error
+from son.completion_index import complete_playlist_names, remove_song_paths
 from son.console import console
 
 if TYPE_CHECKING:
@@ -10,7 +10,7 @@ if TYPE_CHECKING:
 
 
 @click.command()
-@click.argument('name')
+@click.argument('name', shell_complete=complete_playlist_names)
 @click.pass_obj
 def delete(obj: 'Container', name: str):
     """
@@ -24,8 +24,11 @@ def delete(obj: 'Container', name: str):
 
     $ son playlist delete my-playlist
     """
-    with obj.db.begin() as session:
-        playlist = get_playlist_or_raise_error(name, session)
-        session.delete(playlist)
+    from son.commands.playlist.queries import delete_playlist, update_completion_index
+
+    delete_playlist(obj, name)
+
+    remove_song_paths(obj.data_dir, name)
+    update_completion_index(obj)
 
     console.print(f'[success]Playlist [bold]{name}[/] deleted.')
@@ -1,10 +1,9 @@
-from pathlib import Path
 from typing import TYPE_CHECKING
 
 import click
-from rich.panel import Panel
 
-from son.commands.playlist.utils import get_playlist_or_raise_error, get_printable_datetime, print_table
+from son.commands.playlist.output import output_options, write_records
+from son.completion_index import complete_playlist_names
 from son.console import console
 
 if TYPE_CHECKING:
@@ -12,6 +11,8 @@ if TYPE_CHECKING:
 
 
 def print_panel(title: str, fields: dict[str, str]) -> None:
+    from rich.panel import Panel
+
     sorted_keys = sorted(fields.keys(), key=len, reverse=True)
     longest_field_length = len(sorted_keys[0])
     text_to_render = ''
@@ -21,55 +22,58 @@ def print_panel(title: str, fields: dict[str, str]) -> None:
     console.print(Panel.fit(text_to_render, title=title, border_style='bold #FFD700'))
 
 
-def get_printable_duration(duration: int) -> str:
-    minutes, seconds = divmod(duration, 60)
-    # Calculate hours and minutes
-    hours, minutes = divmod(minutes, 60)
-
-    # Generate formatted time string
-    time_str = ''
-    if hours > 0:
-        time_str += f'{hours}h'
-    if minutes > 0:
-        time_str += f'{minutes}m'
-    if seconds > 0:
-        time_str += f'{seconds}s'
-    return time_str
-
-
 @click.command()
-@click.argument('name')
+@click.argument('name', shell_complete=complete_playlist_names)
+@output_options
 @click.pass_obj
-def describe(obj: 'Container', name: str):
+def describe(obj: 'Container', name: str, output_format: str, limit: int | None, offset: int | None):
     """
     Describes a playlist.
 
+    With a format other than table, only songs are written, one per line, as they are read from the database.
+
     \b
     Arguments:
         NAME    the name of the playlist.
 
     Example usage:
 
+    \b
     $ son playlist describe my-playlist
+
+    \b
+    # displays songs 101 to 150
+    $ son playlist describe my-playlist --offset 100 --limit 50
+
+    \b
+    # exports songs in the csv format
+    $ son playlist describe my-playlist --format csv > songs.csv
     """
+    from son.commands.playlist.queries import get_playlist_or_raise_error, get_playlist_songs
+    from son.commands.playlist.utils import get_printable_datetime, get_printable_duration, print_table
+    from son.database import get_track_title
+
     with obj.db.Session() as session:
-        playlist = get_playlist_or_raise_error(name, session, select_songs=True)
+        playlist = get_playlist_or_raise_error(name, session)
+        songs = get_playlist_songs(session, playlist.id, limit, offset)
+        if output_format != 'table':
+            write_records(
+                output_format,
+                ('title', 'path', 'created_at', 'duration'),
+                ((get_track_title(path), path, created_at, duration) for path, created_at, duration in songs),
+            )
+            return
+
         fields = {
             'creation date': get_printable_datetime(playlist.created_at),
             'last update': get_printable_datetime(playlist.updated_at),
+            'songs': str(playlist.song_count),
+            'total duration': get_printable_duration(playlist.total_duration),
         }
         print_panel(name, fields)
 
-        rows = []
-        for song in playlist.songs:
-            song_path = Path(song.path)
-            rows.append(
-                (
-                    song_path.stem,
-                    song.path,
-                    get_printable_datetime(song.created_at),
-                    get_printable_duration(song.duration),
-                )
-            )
-
+        rows = (
+            (get_track_title(path), path, get_printable_datetime(created_at), get_printable_duration(duration))
+            for path, created_at, duration in songs
+        )
         print_table('Songs', ('title', 'path', 'creation date', 'duration'), rows)
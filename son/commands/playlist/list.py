@@ -1,13 +1,15 @@
+from collections.abc import Iterable
 from typing import TYPE_CHECKING
 
 import click
-from rapidfuzz import fuzz, process, utils
 
-from son.database import Playlist
+from son.console import error_console
 
-from .utils import get_printable_datetime, print_table
+from .output import output_options, write_records
 
 if TYPE_CHECKING:
+    from sqlalchemy import Row
+
     from son.main import Container
 
 
@@ -21,8 +23,25 @@ if TYPE_CHECKING:
     show_default=True,
     help='A value used in combination with  the --name option to control the number of results to return.',
 )
+@click.option(
+    '-s',
+    '--sort-by',
+    type=click.Choice(['name', 'songs', 'duration']),
+    default='name',
+    show_default=True,
+    help='The order of playlists, songs and duration put the longest playlists first.',
+)
+@output_options
 @click.pass_obj
-def list_playlists(obj: 'Container', name: str, count: int):
+def list_playlists(
+    obj: 'Container',
+    name: str,
+    count: int,
+    sort_by: str,
+    output_format: str,
+    limit: int | None,
+    offset: int | None,
+):
     """
     Lists playlists.
 
@@ -39,25 +58,65 @@ def list_playlists(obj: 'Container', name: str, count: int):
     \b
     # Since the search is a fuzzy one, you can limit the number of playlists returned, by default it is 10.
     $ son playlist list my-playlist -n name -c 5
+
+    \b
+    # lists playlists from the longest to the shortest
+    $ son playlist list --sort-by duration
+
+    \b
+    # displays playlists 21 to 40
+    $ son playlist list --offset 20 --limit 20
+
+    \b
+    # exports playlists in the jsonl format, one json object per line
+    $ son playlist list --format jsonl > playlists.jsonl
     """
-    names_to_search = []
-    playlists_info = {}
+    from sqlalchemy import select
+
+    from son.database import Playlist
+    from son.fuzzy_search import FuzzyIndex
+
+    from .utils import SQL_CHUNK_SIZE, get_printable_datetime, get_printable_duration, print_table
+
+    if name and (limit is not None or offset is not None):
+        error_console.print(
+            '[error]Options [bold]--limit[/] and [bold]--offset[/] cannot be used with [bold]--name[/].'
+        )
+        raise SystemExit(1)
+
+    order_by = {
+        'name': (Playlist.name,),
+        'songs': (Playlist.song_count.desc(), Playlist.name),
+        'duration': (Playlist.total_duration.desc(), Playlist.name),
+    }[sort_by]
+    statement = select(
+        Playlist.name, Playlist.song_count, Playlist.total_duration, Playlist.created_at, Playlist.updated_at
+    ).order_by(*order_by)
 
     with obj.db.Session() as session:
-        for playlist in session.execute(Playlist.select()).scalars():
-            names_to_search.append(playlist.name)
-            playlists_info[playlist.name] = (
-                playlist.name,
-                get_printable_datetime(playlist.created_at),
-                get_printable_datetime(playlist.updated_at),
+        # song count and total duration are stored on the playlist, so songs are not read
+        if name:
+            index = FuzzyIndex((playlist[0], playlist) for playlist in session.execute(statement))
+            playlists: Iterable[Row] = [playlist for playlist, _score in index.search(name, count)]
+        else:
+            statement = statement.limit(limit).offset(offset).execution_options(yield_per=SQL_CHUNK_SIZE)
+            playlists = session.execute(statement)
+
+        if output_format != 'table':
+            write_records(
+                output_format, ('name', 'song_count', 'total_duration', 'created_at', 'updated_at'), playlists
+            )
+            return
+
+        # only displayed playlists are formatted
+        rows = (
+            (
+                playlist_name,
+                str(song_count),
+                get_printable_duration(total_duration),
+                get_printable_datetime(created_at),
+                get_printable_datetime(updated_at),
             )
-    if name:
-        # I use "name.lower()" because the utils.default_process will "lower" the choices, so I think
-        # it will be more accurate
-        results = process.extract(  # type: ignore
-            name.lower(), names_to_search, scorer=fuzz.WRatio, limit=count, processor=utils.default_process
+            for playlist_name, song_count, total_duration, created_at, updated_at in playlists
         )
-        rows = (playlists_info[playlist_name] for playlist_name, score, index in results)
-    else:
-        rows = (row for row in playlists_info.values())
-    print_table('Playlists', ('name', 'creation date', 'last update'), rows)
+        print_table('Playlists', ('name', 'songs', 'duration', 'creation date', 'last update'), rows)
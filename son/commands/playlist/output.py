@@ -0,0 +1,56 @@
+# Output formats of commands listing rows. This module is imported when commands are loaded, so it must stay cheap to
+# import: shell completion loads the command of the argument being completed.
+import csv
+import json
+import sys
+from collections.abc import Callable, Iterable
+from datetime import datetime
+from typing import Any, TypeVar
+
+import click
+
+F = TypeVar('F', bound=Callable[..., Any])
+
+
+def output_options(function: F) -> F:
+    """Adds the --format, --limit and --offset options to a listing command."""
+    options = [
+        click.option(
+            '--format',
+            'output_format',
+            type=click.Choice(['table', 'jsonl', 'csv', 'tsv']),
+            default='table',
+            show_default=True,
+            help='The output format, jsonl, csv and tsv rows are written as soon as they are read.',
+        ),
+        click.option('--limit', type=click.IntRange(min=1), help='The maximum number of rows to display.'),
+        click.option('--offset', type=click.IntRange(min=0), help='The number of rows to skip.'),
+    ]
+    for option in reversed(options):
+        function = option(function)
+    return function
+
+
+def _get_json_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def write_records(output_format: str, fields: tuple[str, ...], rows: Iterable[tuple[Any, ...]]) -> None:
+    """
+    Writes rows on the standard output in the jsonl, csv or tsv format, one line per row.
+
+    Rows are written as they are consumed, so rows coming from a database cursor are never all held in memory.
+    Datetimes are written in the ISO 8601 format and missing values as null in jsonl and as empty strings otherwise.
+    """
+    output = sys.stdout
+    if output_format == 'jsonl':
+        for row in rows:
+            output.write(json.dumps(dict(zip(fields, row, strict=True)), default=_get_json_value) + '\n')
+        return
+
+    writer = csv.writer(output, delimiter='\t' if output_format == 'tsv' else ',', lineterminator='\n')
+    writer.writerow(fields)
+    for row in rows:
+        writer.writerow(value.isoformat() if isinstance(value, datetime) else value for value in row)
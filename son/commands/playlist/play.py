@@ -1,37 +1,53 @@
 import random
-import time
 from pathlib import Path
 from typing import TYPE_CHECKING
 
 import click
-import nava
 
-from son.commands.playlist.utils import get_playlist_or_raise_error
+from son.completion_index import complete_playlist_names
 from son.console import console, show_play_progress
-from son.database import Song
 
 if TYPE_CHECKING:
     from son.main import Container
+    from son.playback import Track
 
 
-def run_playlist(songs: list[Song]) -> None:
-    count = len(songs)
-    for index, song in enumerate(songs, start=1):
-        sound_id = nava.play(song.path, async_mode=True)
-        show_play_progress(song.duration, f'[bold]{Path(song.path).name}[/] [cyan]({index}/{count})[/]', transient=True)
-        nava.stop(sound_id)
-        # without time, it is a bit quick between songs ^^
-        time.sleep(1)
+def run_playlist(tracks: list['Track'], gap: float, refresh_rate: float, missing_paths: set[str]) -> int:
+    """
+    Plays tracks and returns the number of tracks played.
+
+    Tracks whose file does not exist are skipped, they are reported once and added to "missing_paths".
+    """
+    from son.playback import NavaSink, PlaylistPlayer
 
-    console.print('[info]Playlist finished!')
+    def show_track_progress(track: 'Track', index: int, count: int, deadline: float) -> None:
+        message = f'[bold]{Path(track.path).name}[/] [cyan]({index}/{count})[/]'
+        show_play_progress(track.duration, message, transient=True, deadline=deadline, refresh_rate=refresh_rate)
+
+    def report_missing_track(track: 'Track') -> None:
+        if track.path not in missing_paths:
+            missing_paths.add(track.path)
+            console.print(f'[warning]Song [bold]{track.path}[/] does not exist, you should remove it from playlist.')
+
+    player = PlaylistPlayer(NavaSink(), gap, on_track=show_track_progress, on_missing_track=report_missing_track)
+    played = player.play(tracks)
+    if played:
+        console.print('[info]Playlist finished!')
+    return played
 
 
 @click.command()
-@click.argument('name')
+@click.argument('name', shell_complete=complete_playlist_names)
 @click.option('--shuffle', is_flag=True, default=False, help='Shuffle songs in the playlist before reading them.')
 @click.option('--loop', is_flag=True, default=False, help='Play the playlist in loop.')
+@click.option(
+    '--gapless',
+    is_flag=True,
+    default=False,
+    help='Chain songs without silence. Otherwise, the silence length is given by the SON_PLAYLIST_GAP setting.',
+)
 @click.pass_obj
-def play(obj: 'Container', name: str, shuffle: bool, loop: bool):
+def play(obj: 'Container', name: str, shuffle: bool, loop: bool, gapless: bool):
     """
     Plays the given playlist.
 
@@ -53,34 +69,32 @@ def play(obj: 'Container', name: str, shuffle: bool, loop: bool):
     # Plays songs in loop
     $ son playlist play my-playlist --loop
 
+    \b
+    # Plays songs without silence between them
+    $ son playlist play my-playlist --gapless
+
     \b
     # You can mix options
     $ son playlist play my-playlist --shuffle --loop
     """
+    from son.commands.playlist.queries import get_playlist_or_raise_error, get_playlist_song_durations
+    from son.playback import Track
+
+    # the session is closed before playing, so a playlist played for hours doesn't hold a read transaction
     with obj.db.Session() as session:
-        playlist = get_playlist_or_raise_error(name, session, select_songs=True)
-        existing_songs = []
-        not_found_songs = []
-        for song in playlist.songs:
-            if Path(song.path).exists():
-                existing_songs.append(song)
-            else:
-                not_found_songs.append(song.path)
-
-        if not_found_songs:
-            console.print('[warning]The following songs do not exist, you should remove them from playlist:')
-            for song_path in not_found_songs:
-                console.print(f'• {song_path}')
-
-        if not existing_songs:
+        playlist = get_playlist_or_raise_error(name, session)
+        tracks = [Track(path, duration) for path, duration in get_playlist_song_durations(session, playlist.id)]
+
+    if shuffle:
+        random.shuffle(tracks)
+
+    gap = 0 if gapless else obj.settings.playlist_gap
+    refresh_rate = obj.settings.refresh_rate
+    missing_paths: set[str] = set()
+    while True:
+        played = run_playlist(tracks, gap, refresh_rate, missing_paths)
+        if not played:
             console.print('[warning]No song found, so nothing to play. :person_shrugging:')
             return
-
-        if shuffle:
-            random.shuffle(existing_songs)
-
-        if loop:
-            while True:
-                run_playlist(existing_songs)
-        else:
-            run_playlist(existing_songs)
+        if not loop:
+            return
@@ -0,0 +1,322 @@
+from collections.abc import Iterable, Iterator
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from sqlalchemy import Row, func, literal_column, or_, select, text
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from son.completion_index import write_playlist_names, write_song_paths
+from son.console import error_console
+from son.database import (
+    REFRESH_PLAYLIST_AGGREGATES,
+    Playlist,
+    PlaylistFolder,
+    PlaylistTrack,
+    Track,
+    retry_on_busy,
+    track_fts,
+)
+
+from .utils import SQL_CHUNK_SIZE, chunked
+
+if TYPE_CHECKING:
+    from alchemical import Alchemical
+
+    from son.main import Container
+
+
+def get_playlist_or_raise_error(name: str, session: Session) -> Playlist:
+    statement = Playlist.select().where(Playlist.name == name)
+    playlist = session.execute(statement).scalar_one_or_none()
+    if playlist is None:
+        error_console.print(f'[error]There is no playlist [bold]{name}[/].')
+        raise SystemExit(1)
+    return playlist
+
+
+def get_playlist_songs(
+    session: Session, playlist_id: int, limit: int | None = None, offset: int | None = None
+) -> Iterator[Row[tuple[str, datetime, int]]]:
+    """
+    Yields (path, created_at, duration) rows of playlist songs, in the playlist order.
+
+    Rows are fetched from the cursor by batches while they are consumed, so the session must stay open meanwhile.
+    """
+    statement = (
+        select(Track.path, PlaylistTrack.created_at, Track.duration)
+        .join(PlaylistTrack.track)
+        .where(PlaylistTrack.playlist_id == playlist_id)
+        .order_by(PlaylistTrack.position)
+        .limit(limit)
+        .offset(offset)
+        .execution_options(yield_per=SQL_CHUNK_SIZE)
+    )
+    yield from session.execute(statement)
+
+
+def get_playlist_song_durations(session: Session, playlist_id: int) -> Iterator[Row[tuple[str, int]]]:
+    """Yields (path, duration) rows of playlist songs, in the playlist order, fetched by batches."""
+    statement = (
+        select(Track.path, Track.duration)
+        .join(PlaylistTrack.track)
+        .where(PlaylistTrack.playlist_id == playlist_id)
+        .order_by(PlaylistTrack.position)
+        .execution_options(yield_per=SQL_CHUNK_SIZE)
+    )
+    yield from session.execute(statement)
+
+
+def get_playlist_song_paths(session: Session, playlist_id: int) -> list[str]:
+    statement = (
+        select(Track.path)
+        .join(PlaylistTrack.track)
+        .where(PlaylistTrack.playlist_id == playlist_id)
+        .order_by(PlaylistTrack.position)
+    )
+    return list(session.execute(statement).scalars())
+
+
+def get_track_paths(session: Session, playlist_id: int | None = None) -> Iterator[tuple[int, str]]:
+    """Yields (id, path) of tracks of the playlist, or of tracks belonging to a playlist if none is given."""
+    if playlist_id is None:
+        statement = select(Track.id, Track.path).where(Track.playlists.any())
+    else:
+        statement = (
+            select(Track.id, Track.path)
+            .join(PlaylistTrack.track)
+            .where(PlaylistTrack.playlist_id == playlist_id)
+            .order_by(PlaylistTrack.position)
+        )
+    yield from session.execute(statement)
+
+
+def search_tracks(
+    session: Session, query: str, limit: int, playlist_id: int | None = None
+) -> list[Row[tuple[int, str]]]:
+    """
+    Returns (id, path) rows of the tracks matching the full-text query, the most relevant first.
+
+    Tracks are restricted to the ones of the playlist, or to tracks belonging to a playlist if none is given.
+    """
+    statement = (
+        select(Track.id, Track.path)
+        .join(track_fts, track_fts.c.rowid == Track.id)
+        .where(literal_column('track_fts').match(query))
+        .order_by(track_fts.c.rank)
+        .limit(limit)
+    )
+    if playlist_id is None:
+        statement = statement.where(Track.playlists.any())
+    else:
+        statement = statement.where(Track.playlists.any(PlaylistTrack.playlist_id == playlist_id))
+    return list(session.execute(statement))
+
+
+def get_track_playlist_names(session: Session, track_ids: list[int]) -> dict[int, list[str]]:
+    """Returns names of playlists containing each track, indexed by track id."""
+    playlist_names: dict[int, list[str]] = {track_id: [] for track_id in track_ids}
+    for chunk in chunked(track_ids, SQL_CHUNK_SIZE):
+        statement = (
+            select(PlaylistTrack.track_id, Playlist.name)
+            .join(PlaylistTrack.playlist)
+            .where(PlaylistTrack.track_id.in_(chunk))
+            .order_by(Playlist.name)
+        )
+        for track_id, name in session.execute(statement):
+            playlist_names[track_id].append(name)
+    return playlist_names
+
+
+def delete_playlist_tracks(session: Session, playlist_id: int, track_paths: dict[int, str]) -> set[str]:
+    """Removes tracks given as {id: path} from the playlist and returns paths of the ones that were in it."""
+    deleted_paths = set()
+    for chunk in chunked(track_paths, SQL_CHUNK_SIZE):
+        statement = (
+            PlaylistTrack.delete()
+            .where(PlaylistTrack.playlist_id == playlist_id, PlaylistTrack.track_id.in_(chunk))
+            .returning(PlaylistTrack.track_id)
+        )
+        deleted_paths.update(track_paths[track_id] for track_id in session.execute(statement).scalars())
+    return deleted_paths
+
+
+def delete_songs(session: Session, playlist_id: int, song_paths: Iterable[str]) -> set[str]:
+    """Deletes songs from the playlist and returns paths of the songs that were really deleted."""
+    track_paths = {}
+    # SQLite limits the number of variables in a statement, so paths are looked up by chunks
+    for chunk in chunked(song_paths, SQL_CHUNK_SIZE):
+        track_paths.update(session.execute(select(Track.id, Track.path).where(Track.path.in_(chunk))).all())
+    # tracks stay in the library, other playlists may contain them
+    return delete_playlist_tracks(session, playlist_id, track_paths)
+
+
+def get_song_snapshots(session: Session, playlist_id: int) -> dict[str, tuple[int | None, int | None]]:
+    """Returns the (size, mtime_ns) snapshot of each playlist song, indexed by path."""
+    statement = (
+        select(Track.path, Track.size, Track.mtime_ns)
+        .join(PlaylistTrack.track)
+        .where(PlaylistTrack.playlist_id == playlist_id)
+    )
+    return {path: (size, mtime_ns) for path, size, mtime_ns in session.execute(statement)}
+
+
+def get_playlist_folders(session: Session, playlist_id: int) -> list[str]:
+    statement = (
+        select(PlaylistFolder.path).where(PlaylistFolder.playlist_id == playlist_id).order_by(PlaylistFolder.path)
+    )
+    return list(session.execute(statement).scalars())
+
+
+@retry_on_busy
+def link_playlist_folders(
+    obj: 'Container', playlist_name: str, folders: Iterable[str], unlinked: Iterable[str]
+) -> None:
+    with obj.db.begin() as session:
+        playlist = get_playlist_or_raise_error(playlist_name, session)
+        rows = [{'path': folder, 'playlist_id': playlist.id} for folder in folders]
+        if rows:
+            session.execute(insert(PlaylistFolder).values(rows).on_conflict_do_nothing())
+        session.execute(
+            PlaylistFolder.delete().where(
+                PlaylistFolder.playlist_id == playlist.id, PlaylistFolder.path.in_(list(unlinked))
+            )
+        )
+
+
+def delete_matching_songs(session: Session, playlist_id: int, glob: str | None, regex: str | None) -> set[str]:
+    """Deletes songs whose path matches the glob or regex pattern and returns their paths."""
+    conditions = []
+    if glob is not None:
+        # SQLite "*" already matches "/", so "**" is not needed, but it is commonly used to match sub folders
+        conditions.append(Track.path.op('GLOB')(glob.replace('**', '*')))
+    if regex is not None:
+        conditions.append(Track.path.regexp_match(regex))
+    if not conditions:
+        return set()
+
+    statement = (
+        select(Track.id, Track.path)
+        .join(PlaylistTrack.track)
+        .where(PlaylistTrack.playlist_id == playlist_id, or_(*conditions))
+    )
+    return delete_playlist_tracks(session, playlist_id, dict(session.execute(statement).all()))
+
+
+@retry_on_busy
+def remove_playlist_songs(
+    obj: 'Container',
+    playlist_name: str,
+    song_paths: Iterable[str] = (),
+    glob: str | None = None,
+    regex: str | None = None,
+) -> set[str]:
+    """Removes songs given by path or matching a pattern from the playlist and returns paths of removed songs."""
+    with obj.db.begin() as session:
+        playlist = get_playlist_or_raise_error(playlist_name, session)
+        deleted_paths = delete_songs(session, playlist.id, song_paths)
+        deleted_paths.update(delete_matching_songs(session, playlist.id, glob, regex))
+    return deleted_paths
+
+
+def get_inconsistent_playlists(session: Session) -> list[Row[tuple[str, int, int, int, int]]]:
+    """
+    Returns (name, song_count, actual song count, total_duration, actual total duration) rows of playlists whose
+    stored aggregates do not match their songs.
+    """
+    actual = (
+        select(
+            PlaylistTrack.playlist_id,
+            func.count().label('song_count'),
+            func.coalesce(func.sum(Track.duration), 0).label('total_duration'),
+        )
+        .join(PlaylistTrack.track)
+        .group_by(PlaylistTrack.playlist_id)
+        .subquery()
+    )
+    actual_song_count = func.coalesce(actual.c.song_count, 0)
+    actual_total_duration = func.coalesce(actual.c.total_duration, 0)
+    statement = (
+        select(Playlist.name, Playlist.song_count, actual_song_count, Playlist.total_duration, actual_total_duration)
+        .outerjoin(actual, actual.c.playlist_id == Playlist.id)
+        .where(or_(Playlist.song_count != actual_song_count, Playlist.total_duration != actual_total_duration))
+        .order_by(Playlist.name)
+    )
+    return list(session.execute(statement))
+
+
+@retry_on_busy
+def repair_playlist_aggregates(obj: 'Container') -> None:
+    with obj.db.begin() as session:
+        session.execute(text(REFRESH_PLAYLIST_AGGREGATES))
+
+
+@retry_on_busy
+def create_playlist(name: str, db: 'Alchemical') -> int:
+    try:
+        with db.begin() as session:
+            playlist = Playlist(name=name)
+            session.add(playlist)
+            session.flush()
+            return playlist.id
+    except IntegrityError:
+        error_console.print(f'[error]Playlist [bold]{name}[/] already exists.')
+        raise SystemExit(1) from None
+
+
+@retry_on_busy
+def delete_playlist(obj: 'Container', name: str) -> None:
+    with obj.db.begin() as session:
+        playlist = get_playlist_or_raise_error(name, session)
+        # songs are deleted in one statement, otherwise the ORM cascade loads and deletes them one by one
+        session.execute(PlaylistTrack.delete().where(PlaylistTrack.playlist_id == playlist.id))
+        session.execute(PlaylistFolder.delete().where(PlaylistFolder.playlist_id == playlist.id))
+        session.delete(playlist)
+
+
+@retry_on_busy
+def clear_playlists(obj: 'Container') -> None:
+    with obj.db.begin() as session:
+        session.execute(Playlist.delete())
+        session.execute(PlaylistTrack.delete())
+        session.execute(Track.delete())
+        session.execute(PlaylistFolder.delete())
+
+
+@retry_on_busy
+def rename_playlist(obj: 'Container', old_name: str, new_name: str) -> None:
+    with obj.db.begin() as session:
+        get_playlist_or_raise_error(old_name, session)
+        try:
+            session.execute(Playlist.update().where(Playlist.name == old_name).values(name=new_name))
+        except IntegrityError:
+            error_console.print(f'[error]Playlist [bold]{new_name}[/] already exists.')
+            raise SystemExit(1) from None
+
+
+def update_completion_index(obj: 'Container', playlist_names: Iterable[str] = ()) -> None:
+    """Rewrites the playlist names and the song paths of the given playlists read by shell completion."""
+    write_completion_index(obj.db, obj.data_dir, playlist_names)
+
+
+def rebuild_completion_index(db: 'Alchemical', data_dir: Path) -> None:
+    """Rewrites the playlist names and the song paths of all playlists read by shell completion."""
+    with db.Session() as session:
+        playlist_names = list(session.execute(select(Playlist.name)).scalars())
+    write_completion_index(db, data_dir, playlist_names)
+
+
+def write_completion_index(db: 'Alchemical', data_dir: Path, playlist_names: Iterable[str]) -> None:
+    with db.Session() as session:
+        write_playlist_names(data_dir, session.execute(select(Playlist.name).order_by(Playlist.name)).scalars())
+        for name in playlist_names:
+            statement = (
+                select(Track.path)
+                .join(PlaylistTrack.track)
+                .join(PlaylistTrack.playlist)
+                .where(Playlist.name == name)
+                .order_by(PlaylistTrack.position)
+            )
+            write_song_paths(data_dir, name, session.execute(statement).scalars())
@@ -1,14 +1,12 @@
+import re
 from collections.abc import Iterable
 from pathlib import Path
 from typing import TYPE_CHECKING
 
 import click
-import questionary
 
+from son.completion_index import complete_playlist_names, complete_song_paths
 from son.console import console, error_console
-from son.database import Song
-
-from .utils import get_playlist_or_raise_error
 
 if TYPE_CHECKING:
     from son.main import Container
@@ -29,55 +27,83 @@ def print_successful_message(song_paths: Iterable[str]) -> None:
         console.print(f':heavy_check_mark:  {song}', highlight=False)
 
 
-def handle_non_interactive_song_removal(obj: 'Container', playlist_name: str, songs: set[str]) -> None:
-    if not songs:
+def handle_non_interactive_song_removal(
+    obj: 'Container', playlist_name: str, songs: set[str], glob: str | None = None, regex: str | None = None
+) -> None:
+    if not songs and glob is None and regex is None:
         console.print('[warning]No songs were provided, so nothing to do. :person_shrugging:')
         return
-    with obj.db.begin() as session:
-        playlist = get_playlist_or_raise_error(playlist_name, session)
-        song_models = session.execute(Song.select().where(Song.playlist == playlist, Song.path.in_(songs))).scalars()
-
-        database_song_paths = {song.path for song in song_models}
-        songs_not_found = songs - database_song_paths
-        print_warning_message(songs_not_found)
-
-        session.execute(Song.delete().where(Song.playlist == playlist, Song.path.in_(database_song_paths)))
+    from .queries import remove_playlist_songs, update_completion_index
 
+    database_song_paths = remove_playlist_songs(obj, playlist_name, songs, glob, regex)
+    print_warning_message(songs - database_song_paths)
+    update_completion_index(obj, [playlist_name])
     if database_song_paths:
-        print_successful_message(database_song_paths)
+        print_successful_message(sorted(database_song_paths))
     else:
         console.print('[info]No songs were removed.')
 
 
 def handle_interactive_song_removal(obj: 'Container', playlist_name: str) -> None:
-    with obj.db.begin() as session:
-        playlist = get_playlist_or_raise_error(playlist_name, session, select_songs=True)
-        song_paths = questionary.checkbox(
-            'Select songs to remove:', [song.path for song in playlist.songs], qmark='>'
-        ).ask()
-        if not song_paths:
-            console.print('[warning]No songs were selected, so nothing to do. :person_shrugging:')
-            return
+    import questionary
+
+    from .queries import (
+        get_playlist_or_raise_error,
+        get_playlist_song_paths,
+        remove_playlist_songs,
+        update_completion_index,
+    )
+
+    # we don't keep a transaction open while the user is choosing songs
+    with obj.db.Session() as session:
+        playlist = get_playlist_or_raise_error(playlist_name, session)
+        all_song_paths = get_playlist_song_paths(session, playlist.id)
+
+    song_paths = questionary.checkbox('Select songs to remove:', all_song_paths, qmark='>').ask()
+    if not song_paths:
+        console.print('[warning]No songs were selected, so nothing to do. :person_shrugging:')
+        return
 
-        session.execute(Song.delete().where(Song.playlist == playlist, Song.path.in_(song_paths)))
-        print_successful_message(song_paths)
+    remove_playlist_songs(obj, playlist_name, song_paths)
+    update_completion_index(obj, [playlist_name])
+    print_successful_message(song_paths)
+
+
+def validate_regex(_ctx: click.Context, _param: click.Parameter, value: str | None) -> str | None:
+    if value is None:
+        return value
+    try:
+        re.compile(value)
+    except re.error as e:
+        raise click.BadParameter(f'{value} is not a valid regular expression: {e}') from None
+    return value
 
 
 @click.command('rm-songs')
-@click.argument('name')
+@click.argument('name', shell_complete=complete_playlist_names)
 @click.option(
     '-s',
     '--song',
     'songs',
     callback=lambda ctx, param, value: {Path(item).as_posix() for item in value},
     multiple=True,
+    shell_complete=complete_song_paths,
     help='Song to remove. You should pass the full path of the song.',
 )
+@click.option(
+    '-m',
+    '--match',
+    'glob',
+    help='Removes songs whose full path matches this glob pattern. "*" and "**" match any characters, including "/".',
+)
+@click.option(
+    '-r', '--regex', callback=validate_regex, help='Removes songs whose full path matches this regular expression.'
+)
 @click.option(
     '-i', '--interactive', is_flag=True, default=False, help='Choose songs to delete from the displayed select form.'
 )
 @click.pass_obj
-def remove_songs(obj: 'Container', name: str, songs: set[str], interactive: bool):
+def remove_songs(obj: 'Container', name: str, songs: set[str], glob: str | None, regex: str | None, interactive: bool):
     """
     Removes songs from the given playlist.
 
@@ -98,15 +124,23 @@ def remove_songs(obj: 'Container', name: str, songs: set[str], interactive: bool
     # Linux/Unix case
     $ son playlist rm-songs -s /home/foo/song1.wav -s /home/foo/song2.wav
 
+    \b
+    # Removes all songs under the folder /home/foo/old
+    $ son playlist rm-songs my-playlist -m '/home/foo/old/**'
+
+    \b
+    # Removes songs whose path contains "live" or "demo"
+    $ son playlist rm-songs my-playlist -r 'live|demo'
+
     \b
     $ Removes songs using a form displaying playlist songs.
     $ son playlist rm-songs -i
     """
-    if songs and interactive:
+    if (songs or glob or regex) and interactive:
         error_console.print('[error]You cannot use interactive mode and passed songs to remove.')
         raise SystemExit(1)
 
     if not interactive:
-        handle_non_interactive_song_removal(obj, name, songs)
+        handle_non_interactive_song_removal(obj, name, songs, glob, regex)
     else:
         handle_interactive_song_removal(obj, name)
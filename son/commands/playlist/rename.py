@@ -1,18 +1,16 @@
 from typing import TYPE_CHECKING
 
 import click
-from sqlalchemy.exc import IntegrityError
 
-from son.commands.playlist.utils import get_playlist_or_raise_error
-from son.console import console, error_console
-from son.database import Playlist
+from son.completion_index import complete_playlist_names, remove_song_paths
+from son.console import console
 
 if TYPE_CHECKING:
     from son.main import Container
 
 
 @click.command('rename')
-@click.argument('old_name')
+@click.argument('old_name', shell_complete=complete_playlist_names)
 @click.argument('new_name')
 @click.pass_obj
 def rename(obj: 'Container', old_name: str, new_name: str):
@@ -30,12 +28,9 @@ def rename(obj: 'Container', old_name: str, new_name: str):
     # Renames playlist from acoustic to RnB
     $ son playlist rename acoustic RnB
     """
-    with obj.db.begin() as session:
-        get_playlist_or_raise_error(old_name, session)
-        try:
-            session.execute(Playlist.update().where(Playlist.name == old_name).values(name=new_name))
-        except IntegrityError:
-            error_console.print(f'[error]Playlist [bold]{old_name}[/] already exists.')
-            raise SystemExit(1) from None
-
-        console.print(f'[success]Renamed playlist [bold]{old_name}[/] to [bold]{new_name}[/]. :glowing_star:')
+    from son.commands.playlist.queries import rename_playlist, update_completion_index
+
+    rename_playlist(obj, old_name, new_name)
+    remove_song_paths(obj.data_dir, old_name)
+    update_completion_index(obj, [new_name])
+    console.print(f'[success]Renamed playlist [bold]{old_name}[/] to [bold]{new_name}[/]. :glowing_star:')
@@ -0,0 +1,257 @@
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from stat import S_ISLNK
+from typing import TYPE_CHECKING
+
+import click
+
+from son.completion_index import complete_playlist_names
+from son.console import console, error_console
+
+if TYPE_CHECKING:
+    from son.main import Container
+
+# (size, mtime_ns) of a file, a file whose snapshot changed is probed again
+Snapshot = tuple[int, int]
+
+
+@dataclass(frozen=True)
+class FolderScan:
+    # snapshot of each song found, indexed by resolved path
+    snapshots: dict[str, Snapshot]
+    # folders which are missing or not readable, like a folder on an unmounted drive
+    unavailable_folders: list[str]
+
+
+@dataclass(frozen=True)
+class SyncResult:
+    added: list[str]
+    updated: list[str]
+    removed: list[str]
+    unavailable_folders: list[str]
+
+
+def is_folder_available(folder: str) -> bool:
+    try:
+        # opening the directory is enough to know if it can be walked, its entries are not read
+        with os.scandir(folder):
+            return True
+    except OSError:
+        return False
+
+
+def scan_folders(folders: list[str]) -> FolderScan:
+    """Returns the snapshot of each song found in the available folders and the folders which are not available."""
+    from son.media import WAV_EXTENSIONS
+    from son.scanner import scan_audio_files
+
+    unavailable_folders = [folder for folder in folders if not is_folder_available(folder)]
+    available_folders = [Path(folder) for folder in folders if folder not in unavailable_folders]
+    snapshots = {}
+    # paths are stored resolved in the database, resolving a path stats each of its components, so directories are
+    # resolved once and only symlinked files are resolved individually
+    resolved_directories: dict[str, str] = {}
+    for path in scan_audio_files(available_folders, WAV_EXTENSIONS):
+        try:
+            stat = os.lstat(path)
+            if S_ISLNK(stat.st_mode):
+                resolved_path = os.path.realpath(path)
+                stat = os.stat(resolved_path)
+            else:
+                directory, file_name = os.path.split(path)
+                if directory not in resolved_directories:
+                    resolved_directories[directory] = os.path.realpath(directory)
+                resolved_path = os.path.join(resolved_directories[directory], file_name)
+        except OSError:
+            # removed since the scan
+            continue
+        snapshots[resolved_path.replace(os.sep, '/')] = (stat.st_size, stat.st_mtime_ns)
+    return FolderScan(snapshots, unavailable_folders)
+
+
+def sync_playlist(obj: 'Container', name: str, scan: FolderScan | None = None) -> SyncResult:
+    """
+    Makes songs of the folders linked to the playlist match the files on disk.
+
+    Only files missing from the library and files whose size or modification time changed are probed, songs of
+    removed files are deleted. Songs added from other folders are left untouched, like songs of folders which are not
+    available, their files are not considered removed.
+    """
+    from son.commands.playlist.queries import (
+        delete_songs,
+        get_playlist_folders,
+        get_playlist_or_raise_error,
+        get_song_snapshots,
+    )
+    from son.commands.playlist.utils import add_playlist_tracks, get_library_track_ids, probe_songs, upsert_tracks
+    from son.database import retry_on_busy
+
+    with obj.db.Session() as session:
+        playlist = get_playlist_or_raise_error(name, session)
+        folders = get_playlist_folders(session, playlist.id)
+        stored = get_song_snapshots(session, playlist.id)
+
+    if scan is None:
+        scan = scan_folders(folders)
+    scanned = scan.snapshots
+    prefixes = tuple(f'{folder.rstrip("/")}/' for folder in folders if folder not in scan.unavailable_folders)
+    # a folder may be linked inside another one, its songs also match the prefix of the parent folder
+    unavailable_prefixes = tuple(f'{folder.rstrip("/")}/' for folder in scan.unavailable_folders)
+    added = [path for path in scanned if path not in stored]
+    updated = [path for path in scanned if path in stored and stored[path] != scanned[path]]
+    removed = [
+        path
+        for path in stored
+        if path.startswith(prefixes) and not path.startswith(unavailable_prefixes) and path not in scanned
+    ]
+    if not added and not updated and not removed:
+        return SyncResult([], [], [], scan.unavailable_folders)
+
+    # new files may already be in the library because another playlist contains them
+    with obj.db.Session() as session:
+        library_track_ids = get_library_track_ids(session, [(path, *scanned[path]) for path in added + updated])
+    songs = probe_songs(obj, [(path, *scanned[path]) for path in added + updated if path not in library_track_ids])
+
+    @retry_on_busy
+    def commit() -> None:
+        with obj.db.begin() as session:
+            track_ids = library_track_ids | upsert_tracks(session, songs)
+            add_playlist_tracks(session, playlist.id, track_ids.values())
+            delete_songs(session, playlist.id, removed)
+
+    commit()
+    return SyncResult(sorted(added), sorted(updated), sorted(removed), scan.unavailable_folders)
+
+
+def print_unavailable_folders(folders: list[str]) -> None:
+    for folder in folders:
+        console.print(f'[warning]Folder [bold]{folder}[/] is missing or not readable, its songs are kept.')
+
+
+def print_sync_result(result: SyncResult) -> None:
+    print_unavailable_folders(result.unavailable_folders)
+    for path in result.added:
+        console.print(f':heavy_check_mark:  Song [info]{path}[/] was added to playlist.')
+    for path in result.updated:
+        console.print(f':heavy_check_mark:  Song [info]{path}[/] was updated.')
+    for path in result.removed:
+        console.print(f':cross_mark: Song [info]{path}[/] was removed from playlist.')
+    console.print(
+        f'[success]{len(result.added)} song(s) added, {len(result.updated)} updated, {len(result.removed)} removed.'
+    )
+
+
+def watch_playlist(obj: 'Container', name: str, interval: float) -> None:
+    """Synchronizes the playlist each time the content of its folders changes, until CTRL+C is pressed."""
+    from son.commands.playlist.queries import get_playlist_folders, get_playlist_or_raise_error, update_completion_index
+
+    with obj.db.Session() as session:
+        folders = get_playlist_folders(session, get_playlist_or_raise_error(name, session).id)
+    console.print(f'[info]Watching folders of playlist [bold]{name}[/], press CTRL+C to stop.')
+    previous_scan = None
+    while True:
+        scan = scan_folders(folders)
+        # the database is only read when a file or the availability of a folder changed since the last scan
+        if scan != previous_scan:
+            result = sync_playlist(obj, name, scan)
+            if result.added or result.updated or result.removed:
+                print_sync_result(result)
+                update_completion_index(obj, [name])
+            else:
+                print_unavailable_folders(result.unavailable_folders)
+            previous_scan = scan
+        time.sleep(interval)
+
+
+@click.command()
+@click.argument('name', shell_complete=complete_playlist_names)
+@click.option(
+    '-f',
+    '--folder',
+    'folders',
+    multiple=True,
+    type=click.Path(exists=True, file_okay=False, path_type=Path),
+    help='Folder to link to the playlist before synchronizing it.',
+)
+@click.option(
+    '-u',
+    '--unlink',
+    'unlinked_folders',
+    multiple=True,
+    type=click.Path(file_okay=False, path_type=Path),
+    help='Folder to unlink from the playlist, its songs are kept.',
+)
+@click.option('-w', '--watch', is_flag=True, help='Keeps synchronizing the playlist when files change.')
+@click.option(
+    '--interval',
+    type=click.FloatRange(min=0.1),
+    default=5,
+    show_default=True,
+    help='The time in seconds between two scans of the folders in watch mode.',
+)
+@click.pass_obj
+def sync(
+    obj: 'Container',
+    name: str,
+    folders: tuple[Path, ...],
+    unlinked_folders: tuple[Path, ...],
+    watch: bool,
+    interval: float,
+):
+    """
+    Synchronizes a playlist with its folders.
+
+    Songs of new files are added, songs of modified files are updated and songs of removed files are deleted. Only
+    new and modified files are probed, so synchronizing a large folder which did not change is fast.
+
+    \b
+    Arguments:
+        NAME    the name of the playlist.
+
+    Example usage:
+
+    \b
+    # links the folder my-music to the playlist my-playlist and synchronizes it
+    $ son playlist sync my-playlist -f my-music
+
+    \b
+    # synchronizes the playlist with the folders already linked
+    $ son playlist sync my-playlist
+
+    \b
+    # keeps synchronizing the playlist, scanning folders every 10 seconds
+    $ son playlist sync my-playlist --watch --interval 10
+    """
+    from son.commands.playlist.queries import (
+        get_playlist_folders,
+        get_playlist_or_raise_error,
+        link_playlist_folders,
+        update_completion_index,
+    )
+
+    if folders or unlinked_folders:
+        link_playlist_folders(
+            obj,
+            name,
+            [folder.resolve().as_posix() for folder in folders],
+            [folder.resolve().as_posix() for folder in unlinked_folders],
+        )
+
+    with obj.db.Session() as session:
+        if not get_playlist_folders(session, get_playlist_or_raise_error(name, session).id):
+            if unlinked_folders:
+                console.print(f'[success]Playlist [bold]{name}[/] has no linked folder anymore.')
+                return
+            error_console.print(
+                f'[error]No folder is linked to playlist [bold]{name}[/], use the [bold]--folder[/] option.'
+            )
+            raise SystemExit(1)
+
+    if watch:
+        watch_playlist(obj, name, interval)
+        return
+
+    print_sync_result(sync_playlist(obj, name))
+    update_completion_index(obj, [name])
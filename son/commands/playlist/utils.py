@@ -1,33 +1,60 @@
-from collections.abc import Iterable
+import math
+from collections.abc import Iterable, Iterator
 from datetime import datetime
+from itertools import islice
 from pathlib import Path
+from typing import TYPE_CHECKING, TypeVar
 
 import questionary
-from alchemical import Alchemical
 from rich.table import Table
-from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import func, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
 
 from son.console import console, error_console
-from son.database import Playlist, Song
-from son.media import get_media_duration
+from son.database import PlaylistTrack, Track, retry_on_busy
+from son.media import WAV_EXTENSIONS
+from son.scanner import scan_audio_files
 
+if TYPE_CHECKING:
+    from son.main import Container
 
-def get_playlist_or_raise_error(name: str, session: Session, select_songs: bool = False) -> Playlist:
-    statement = Playlist.select().where(Playlist.name == name)
-    if select_songs:
-        statement.options(selectinload(Playlist.songs))
-    playlist = session.execute(statement).scalar_one_or_none()
-    if playlist is None:
-        error_console.print(f'[error]There is no playlist [bold]{name}[/].')
-        raise SystemExit(1)
-    return playlist
+T = TypeVar('T')
+# SQLite limits the number of variables in a statement (999 before SQLite 3.32), so big statements are split
+SQL_MAX_VARIABLES = 999
+# number of values bound in an IN clause, or of rows fetched at a time
+SQL_CHUNK_SIZE = 500
+# numbers of rows of multi-row inserts, each row binds a variable per column
+TRACK_ROWS_CHUNK_SIZE = SQL_MAX_VARIABLES // 4
+PLAYLIST_TRACK_ROWS_CHUNK_SIZE = SQL_MAX_VARIABLES // 3
+
+
+def chunked(iterable: Iterable[T], size: int) -> Iterator[list[T]]:
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
 
 
 def get_printable_datetime(dt: datetime | None) -> str:
     return dt.strftime('%Y-%m-%d %H:%M:%S') if dt is not None else ''
 
 
+def get_printable_duration(duration: int) -> str:
+    minutes, seconds = divmod(duration, 60)
+    # Calculate hours and minutes
+    hours, minutes = divmod(minutes, 60)
+
+    # Generate formatted time string
+    time_str = ''
+    if hours > 0:
+        time_str += f'{hours}h'
+    if minutes > 0:
+        time_str += f'{minutes}m'
+    if seconds > 0:
+        time_str += f'{seconds}s'
+    return time_str
+
+
 def print_table(title: str, headers: tuple[str, ...], rows: Iterable[tuple[str, ...]]) -> None:
     table = Table(title=title, title_style='cyan')
     for header in headers:
@@ -39,27 +66,146 @@ def print_table(title: str, headers: tuple[str, ...], rows: Iterable[tuple[str,
     console.print(table)
 
 
-def add_songs_to_db(db: Alchemical, playlist_id: int, songs: Iterable[Path]) -> None:
-    # it is not efficient to use one transaction per song, but it is convenient to print
-    # accurate error message and prevent stopping the loop for one duplicated song
-    for song in songs:
+# (resolved path, size, mtime_ns) of a file to import
+SongFile = tuple[str, int, int]
+# (path, duration, size, mtime_ns) of a probed file
+ProbedSong = tuple[str, int, int, int]
+
+
+def stat_song(song: Path) -> SongFile:
+    song = song.resolve()
+    stat = song.stat()
+    return song.as_posix(), stat.st_size, stat.st_mtime_ns
+
+
+def probe_songs(obj: 'Container', songs: list[SongFile]) -> list[ProbedSong]:
+    """
+    Probes songs from an event loop, running at most "import_workers" ffprobe processes at a time, and returns them in
+    the input order, so messages are printed in a stable order.
+    """
+    import asyncio
+
+    from son.media_engine import MediaEngine, ProbeError
+
+    engine = MediaEngine(obj.settings.import_workers)
+    media_cache = obj.media_cache
+
+    async def probe(song: SongFile) -> ProbedSong:
+        path, size, mtime_ns = song
+        info = await engine.probe(Path(path), media_cache)
+        # a fraction of a second is not really important, we just consider the lower integer value for simplicity
+        return path, math.floor(info.duration), size, mtime_ns
+
+    async def probe_all() -> list[ProbedSong]:
+        tasks = [asyncio.ensure_future(probe(song)) for song in songs]
         try:
-            with db.begin() as session:
-                song = song.resolve()
-                duration = get_media_duration(song)
-                session.add(Song(path=song.as_posix(), playlist_id=playlist_id, duration=duration))
-        except IntegrityError:
-            console.print(f':cross_mark: [warning]Song [bold]{song}[/] already exists and was not added.')
-            continue
-        console.print(f':heavy_check_mark:  Song [info]{song}[/] was added to playlist.')
+            return await asyncio.gather(*tasks)
+        finally:
+            # if probing fails, we don't want to wait for all remaining songs to be probed, their ffprobe is killed
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    try:
+        return asyncio.run(probe_all())
+    except ProbeError as e:
+        error_console.print(f'[error]Unable to probe [bold]{e.audio_file}[/], ffprobe error:\n {e.output}')
+        raise SystemExit(1) from None
+
+
+def get_library_track_ids(session: Session, songs: list[SongFile]) -> dict[str, int]:
+    """Returns ids of tracks already in the library and unchanged since they were probed, indexed by path."""
+    snapshots = {path: (size, mtime_ns) for path, size, mtime_ns in songs}
+    track_ids = {}
+    for chunk in chunked(snapshots, SQL_CHUNK_SIZE):
+        statement = select(Track.id, Track.path, Track.size, Track.mtime_ns).where(Track.path.in_(chunk))
+        track_ids.update(
+            (path, track_id)
+            for track_id, path, size, mtime_ns in session.execute(statement)
+            if snapshots[path] == (size, mtime_ns)
+        )
+    return track_ids
+
+
+def upsert_tracks(session: Session, songs: list[ProbedSong]) -> dict[str, int]:
+    """Inserts probed songs in the library, or updates their track, and returns track ids indexed by path."""
+    track_ids = {}
+    for chunk in chunked(songs, TRACK_ROWS_CHUNK_SIZE):
+        rows = [
+            {'path': path, 'duration': duration, 'size': size, 'mtime_ns': mtime_ns}
+            for path, duration, size, mtime_ns in chunk
+        ]
+        statement = insert(Track).values(rows)
+        statement = statement.on_conflict_do_update(
+            index_elements=['path'],
+            set_={
+                'duration': statement.excluded.duration,
+                'size': statement.excluded.size,
+                'mtime_ns': statement.excluded.mtime_ns,
+            },
+        ).returning(Track.path, Track.id)
+        track_ids.update(session.execute(statement).all())
+    return track_ids
+
+
+def add_playlist_tracks(session: Session, playlist_id: int, track_ids: Iterable[int]) -> set[int]:
+    """Appends tracks to the playlist, skipping the ones already present, and returns ids of appended tracks."""
+    statement = select(func.coalesce(func.max(PlaylistTrack.position), 0)).where(
+        PlaylistTrack.playlist_id == playlist_id
+    )
+    last_position = session.execute(statement).scalar_one()
+    added_ids = set()
+    for chunk in chunked(dict.fromkeys(track_ids), PLAYLIST_TRACK_ROWS_CHUNK_SIZE):
+        rows = [
+            {'playlist_id': playlist_id, 'track_id': track_id, 'position': last_position + index}
+            for index, track_id in enumerate(chunk, 1)
+        ]
+        last_position += len(rows)
+        statement = (
+            insert(PlaylistTrack)
+            .values(rows)
+            .on_conflict_do_nothing(index_elements=['playlist_id', 'track_id'])
+            .returning(PlaylistTrack.track_id)
+        )
+        added_ids.update(session.execute(statement).scalars())
+    return added_ids
+
+
+@retry_on_busy
+def commit_songs(
+    obj: 'Container', playlist_id: int, library_track_ids: dict[str, int], probed_songs: list[ProbedSong]
+) -> set[str]:
+    """Adds songs to the library and the playlist, and returns paths of songs which were not in the playlist."""
+    with obj.db.begin() as session:
+        track_ids = library_track_ids | upsert_tracks(session, probed_songs)
+        added_ids = add_playlist_tracks(session, playlist_id, track_ids.values())
+    return {path for path, track_id in track_ids.items() if track_id in added_ids}
+
+
+def add_songs_to_db(obj: 'Container', playlist_id: int, songs: Iterable[Path]) -> None:
+    # songs are handled by batches, songs already in the library are not probed again and the RETURNING clause
+    # tells us which ones were duplicates, messages are printed once the batch is committed.
+    for chunk in chunked(songs, SQL_CHUNK_SIZE):
+        song_files = [stat_song(song) for song in chunk]
+        with obj.db.Session() as session:
+            library_track_ids = get_library_track_ids(session, song_files)
+        songs_to_probe = [song for song in dict.fromkeys(song_files) if song[0] not in library_track_ids]
+        probed_songs = probe_songs(obj, songs_to_probe)
+        added_paths = commit_songs(obj, playlist_id, library_track_ids, probed_songs)
+        for song_path, _, _ in song_files:
+            if song_path in added_paths:
+                # the same song may be passed twice, the second one is a duplicate
+                added_paths.remove(song_path)
+                console.print(f':heavy_check_mark:  Song [info]{song_path}[/] was added to playlist.')
+            else:
+                console.print(f':cross_mark: [warning]Song [bold]{song_path}[/] already exists and was not added.')
 
 
 def add_songs_and_folders(
-    db: Alchemical, playlist_id: int, songs: Iterable[Path], song_folders: Iterable[Path]
+    obj: 'Container', playlist_id: int, songs: Iterable[Path], song_folders: Iterable[Path]
 ) -> None:
-    add_songs_to_db(db, playlist_id, songs)
-    for folder in song_folders:
-        add_songs_to_db(db, playlist_id, folder.rglob('*.wav'))
+    add_songs_to_db(obj, playlist_id, songs)
+    add_songs_to_db(obj, playlist_id, scan_audio_files(song_folders, WAV_EXTENSIONS))
 
 
 def positive_number_validator(value: str) -> str | bool:
@@ -70,12 +216,12 @@ def positive_number_validator(value: str) -> str | bool:
 
 def wav_file_validator(value: str) -> str | bool:
     path = Path(value)
-    if path.is_file() and path.suffix != '.wav':
+    if path.is_file() and path.suffix.lower() not in WAV_EXTENSIONS:
         return 'You must select a .wav file'
     return True
 
 
-def add_songs_and_folders_interactively(db: Alchemical, playlist_id: int) -> None:
+def add_songs_and_folders_interactively(obj: 'Container', playlist_id: int) -> None:
     song_paths = []
     folder_paths = []
     nb_of_paths_to_add = int(
@@ -87,4 +233,4 @@ def add_songs_and_folders_interactively(db: Alchemical, playlist_id: int) -> Non
             folder_paths.append(path)
         else:
             song_paths.append(path)
-    add_songs_and_folders(db, playlist_id, song_paths, folder_paths)
+    add_songs_and_folders(obj, playlist_id, song_paths, folder_paths)
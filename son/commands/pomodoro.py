@@ -1,18 +1,18 @@
-import time
 from dataclasses import dataclass
+from functools import partial
 from pathlib import Path
 from typing import TYPE_CHECKING
 
 import click
-from nava import play
-from rich.progress import Progress
 
-from son.console import console, error_console
+from son.console import console, error_console, show_progress
 from son.media import get_compatible_nava_file_or_raise_error
-from son.settings import Settings
 
 if TYPE_CHECKING:
+    from son.conversion_cache import ConversionCache
     from son.main import Container
+    from son.playback import SoundPool
+    from son.settings import Settings
 
 ACTIVITY_CHOICES = ['session', 's', 'work', 'w', 'short break', 'sb', 'long break', 'lb']
 
@@ -23,7 +23,7 @@ class Activity:
     duration: int
 
 
-def get_activity_information(activity_type: str, settings: Settings) -> Activity:
+def get_activity_information(activity_type: str, settings: 'Settings') -> Activity:
     if activity_type in ACTIVITY_CHOICES[2:4]:
         return Activity(ACTIVITY_CHOICES[2], settings.pomo_work_time)
     elif activity_type in ACTIVITY_CHOICES[4:6]:
@@ -39,35 +39,34 @@ def get_activity_information(activity_type: str, settings: Settings) -> Activity
         return Activity('session', duration)
 
 
-def show_progress(activity: str, duration: int) -> None:
-    with Progress(console=console) as progress:
-        task = progress.add_task(f'{activity}', total=duration)
-        while not progress.finished:
-            progress.update(task, advance=1)
-            time.sleep(1)
+def get_sound(sound: Path | None, settings: 'Settings', conversion_cache: 'ConversionCache') -> str:
+    sound = settings.pomo_sound if sound is None else sound
+    return str(get_compatible_nava_file_or_raise_error(sound, settings, conversion_cache))
 
 
-def get_sound(sound: Path, settings: Settings) -> str:
-    return str(settings.pomo_sound if sound is None else get_compatible_nava_file_or_raise_error(sound, settings))
+def report_slow_alarm(_path: str, latency: float) -> None:
+    console.print(f'[warning]The alarm took {latency:.2f}s more than its length to play, the audio device may be busy.')
 
 
-def run_pomodoro_session(sound: str, long_break_interval: int, settings: Settings) -> None:
+def run_pomodoro_session(sound: str, long_break_interval: int, settings: 'Settings', sound_pool: 'SoundPool') -> None:
     # to align the progress indicator for all activities, I use the "ljust" string method
     # on activities "work" and "long break" to align with the "short break" activity.
     short_break_length = len('short break')
     aligned_work_indication = 'work'.ljust(short_break_length)
+    refresh_rate = settings.refresh_rate
+    play = partial(sound_pool.play, sound)
     for _ in range(long_break_interval - 1):
-        show_progress(aligned_work_indication, settings.pomo_work_time)
-        play(sound)
+        show_progress(aligned_work_indication, settings.pomo_work_time, refresh_rate=refresh_rate)
+        play()
         console.print('[info]Well done mate! time to pause a bit. :sleeping_face:')
-        show_progress('short break', settings.pomo_short_break_time)
-        play(sound)
+        show_progress('short break', settings.pomo_short_break_time, refresh_rate=refresh_rate)
+        play()
         console.print('[info]Time to get back to business! :person_lifting_weights:')
-    show_progress(aligned_work_indication, settings.pomo_work_time)
-    play(sound)
+    show_progress(aligned_work_indication, settings.pomo_work_time, refresh_rate=refresh_rate)
+    play()
     console.print('[info]You can now take a long-deserved pause. :sleeping_face:')
-    show_progress('long break'.ljust(short_break_length), settings.pomo_long_break_time)
-    play(sound)
+    show_progress('long break'.ljust(short_break_length), settings.pomo_long_break_time, refresh_rate=refresh_rate)
+    play()
     console.print('[success]Congratulations! You have completed a full pomodoro session! :clapping_hands:')
 
 
@@ -143,16 +142,21 @@ def pomodoro(
     # start a "short break" pomodoro activity with a duration of 2 minutes instead of 5. Time is in seconds.
     $ son pomodoro -a sb -d 120
     """
+    from son.playback import SoundPool
+
     if duration is not None and activity_type in ACTIVITY_CHOICES[:2]:
         error_console.print('[error] You cannot set a duration for "session" activity.')
         raise SystemExit(1)
 
     activity = get_activity_information(activity_type, obj.settings)
     duration = duration or activity.duration
-    sound = get_sound(sound, obj.settings)
+    sound = get_sound(sound, obj.settings, obj.conversion_cache)
+    # the alarm is loaded now, so that a missing or unreadable file is reported before the activity starts
+    sound_pool = SoundPool(on_slow_sound=report_slow_alarm)
+    sound_pool.load(sound)
     if activity.name != 'session':
-        show_progress(activity.name, duration)
-        play(sound)
+        show_progress(activity.name, duration, refresh_rate=obj.settings.refresh_rate)
+        sound_pool.play(sound)
     else:
         long_break_interval = long_break_interval or obj.settings.pomo_long_break_interval
-        run_pomodoro_session(sound, long_break_interval, obj.settings)
+        run_pomodoro_session(sound, long_break_interval, obj.settings, sound_pool)
@@ -0,0 +1,104 @@
+from typing import TYPE_CHECKING
+
+import click
+
+from son.completion_index import complete_playlist_names
+from son.console import error_console
+
+if TYPE_CHECKING:
+    from sqlalchemy.orm import Session
+
+    from son.main import Container
+
+
+def search_with_index(session: 'Session', query: str, count: int, playlist_id: int | None) -> None:
+    from sqlalchemy.exc import OperationalError
+
+    from son.commands.playlist.queries import get_track_playlist_names, search_tracks
+    from son.commands.playlist.utils import print_table
+    from son.database import get_track_title
+
+    try:
+        tracks = search_tracks(session, query, count, playlist_id)
+    except OperationalError as e:
+        # the query syntax is checked by SQLite
+        error_console.print(f'[error]Invalid full-text query [bold]{query}[/]: {e.orig}')
+        raise SystemExit(1) from None
+    playlist_names = get_track_playlist_names(session, [track_id for track_id, _ in tracks])
+    rows = ((get_track_title(path), path, ', '.join(playlist_names[track_id])) for track_id, path in tracks)
+    print_table('Songs', ('title', 'path', 'playlists'), rows)
+
+
+@click.command()
+@click.argument('query')
+@click.option(
+    '-c',
+    '--count',
+    type=click.IntRange(min=1),
+    default=10,
+    show_default=True,
+    help='The number of songs to return.',
+)
+@click.option(
+    '-p',
+    '--playlist',
+    'playlist_name',
+    shell_complete=complete_playlist_names,
+    help='The playlist to search in, songs of all playlists are searched by default.',
+)
+@click.option(
+    '--fts',
+    is_flag=True,
+    help='Performs a full-text search on song titles and paths instead of a fuzzy search on titles.',
+)
+@click.pass_obj
+def search(obj: 'Container', query: str, count: int, playlist_name: str | None, fts: bool):
+    """
+    Searches songs by title.
+
+    The title of a song is the name of its file without extension, the search is a fuzzy one so the best matches
+    are returned even if they contain typos.
+
+    With --fts, QUERY is a SQLite full-text query matching whole words of song titles and paths: words can end with
+    "*" to match prefixes, be grouped in double quotes to match phrases, be combined with AND, OR and NOT, and be
+    restricted to a column with "title:" or "path:". This search uses an index, so it stays fast on large libraries.
+
+    \b
+    Arguments:
+        QUERY    the title to search.
+
+    Example usage:
+
+    \b
+    # searches songs of all playlists
+    $ son search "bohemian rhapsody"
+
+    \b
+    # returns the 5 best matches in playlist my-playlist
+    $ son search rhapsody -p my-playlist -c 5
+
+    \b
+    # searches songs under a "queen" folder whose title starts with "bohem"
+    $ son search --fts 'path:queen AND title:bohem*'
+    """
+    from son.commands.playlist.queries import get_playlist_or_raise_error, get_track_paths, get_track_playlist_names
+    from son.commands.playlist.utils import print_table
+    from son.database import get_track_title
+    from son.fuzzy_search import FuzzyIndex
+
+    with obj.db.Session() as session:
+        playlist_id = None if playlist_name is None else get_playlist_or_raise_error(playlist_name, session).id
+        if fts:
+            search_with_index(session, query, count, playlist_id)
+            return
+        tracks = get_track_paths(session, playlist_id)
+        index = FuzzyIndex((get_track_title(path), (track_id, path)) for track_id, path in tracks)
+        results = index.search(query, count)
+        # playlists are only read for the songs displayed
+        playlist_names = get_track_playlist_names(session, [track_id for (track_id, _), _ in results])
+
+    rows = (
+        (get_track_title(path), path, ', '.join(playlist_names[track_id]), f'{score:.0f}')
+        for (track_id, path), score in results
+    )
+    print_table('Songs', ('title', 'path', 'playlists', 'score'), rows)
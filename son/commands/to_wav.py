@@ -1,23 +1,205 @@
+import glob
+import os
+import uuid
+from collections.abc import Iterator
+from dataclasses import dataclass
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 import click
 
-from son.console import console
-from son.media import convert_to_wav
+from son.console import console, error_console
+from son.media import WAV_EXTENSIONS, ConversionError, convert_to_wav
+from son.scanner import scan_audio_files
+
+if TYPE_CHECKING:
+    from rich.progress import Progress
+
+    from son.media_engine import MediaEngine
+
+AUDIO_EXTENSIONS = {'.aac', '.aif', '.aiff', '.alac', '.flac', '.m4a', '.mp3', '.mp4', '.oga', '.ogg', '.opus', '.wma'}
+
+
+@dataclass(frozen=True)
+class BatchResult:
+    converted: int
+    skipped: int
+    failures: list[ConversionError]
+
+
+def iter_audio_files(sources: tuple[str, ...]) -> Iterator[Path]:
+    """Yields files of SOURCES, walking directories and expanding glob patterns the shell did not expand."""
+    for source in sources:
+        path = Path(source)
+        if path.is_dir():
+            yield from scan_audio_files([path], AUDIO_EXTENSIONS)
+        elif path.exists():
+            yield path
+        else:
+            matches = sorted(glob.glob(source, recursive=True))
+            if not matches:
+                console.print(f'[warning]No file matches [bold]{source}[/].')
+            yield from (Path(match) for match in matches if Path(match).is_file())
+
+
+def find_output_collisions(audio_files: list[Path]) -> list[ConversionError]:
+    """Returns a failure for each file whose wav file would also be created from another file, like a.mp3 and a.flac."""
+    sources: dict[str, list[Path]] = {}
+    for audio_file in audio_files:
+        if audio_file.suffix.lower() not in WAV_EXTENSIONS:
+            output_path = os.path.normcase(audio_file.with_suffix('.wav').absolute())
+            sources.setdefault(output_path, []).append(audio_file)
+
+    collisions = []
+    for files in sources.values():
+        if len(files) == 1:
+            continue
+        for audio_file in files:
+            others = ', '.join(other.name for other in files if other != audio_file)
+            reason = f'{audio_file.with_suffix(".wav").name} would also be created from {others}'
+            collisions.append(ConversionError(audio_file, reason))
+    return collisions
+
+
+def is_up_to_date(audio_file: Path, output_path: Path) -> bool:
+    try:
+        return output_path.stat().st_mtime_ns >= audio_file.stat().st_mtime_ns
+    except FileNotFoundError:
+        return False
+
+
+async def convert_atomically(engine: 'MediaEngine', audio_file: Path, output_path: Path, progress: 'Progress') -> None:
+    # an interrupted conversion must not leave an output newer than its source, it would be skipped on the next run
+    temporary_path = output_path.with_name(f'.{output_path.stem}.{uuid.uuid4().hex}.wav')
+    # the task is only shown while ffmpeg is running, not while the conversion waits for a free process
+    task_id = None
+
+    def show_progress(seconds: float) -> None:
+        nonlocal task_id
+        if task_id is None:
+            task_id = progress.add_task('', total=None)
+        progress.update(task_id, description=f'  {audio_file.name} [dim]{seconds:.0f}s')
+
+    try:
+        await engine.convert(audio_file, temporary_path, show_progress)
+        os.replace(temporary_path, output_path)
+    except TimeoutError:
+        raise ConversionError(audio_file, f'conversion timed out after {engine.timeout}s') from None
+    finally:
+        if task_id is not None:
+            progress.remove_task(task_id)
+        temporary_path.unlink(missing_ok=True)
+
+
+async def run_conversions(
+    engine: 'MediaEngine', pending: list[tuple[Path, Path]], progress: 'Progress'
+) -> list[ConversionError]:
+    import asyncio
+
+    task_id = progress.add_task('Converting', total=len(pending))
+    tasks = [asyncio.ensure_future(convert_atomically(engine, *arguments, progress)) for arguments in pending]
+    failures = []
+    try:
+        for task in asyncio.as_completed(tasks):
+            try:
+                await task
+            except ConversionError as e:
+                failures.append(e)
+            progress.advance(task_id)
+    finally:
+        # on CTRL+C, running conversions are cancelled and their ffmpeg process killed
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return failures
+
+
+def convert_files(audio_files: list[Path], jobs: int, force: bool, timeout: float | None) -> BatchResult:
+    # asyncio and rich progress bars take tens of milliseconds to import, which shell completion must not pay
+    import asyncio
+
+    from rich.progress import (
+        BarColumn,
+        MofNCompleteColumn,
+        Progress,
+        TextColumn,
+        TimeElapsedColumn,
+        TimeRemainingColumn,
+    )
+
+    from son.media_engine import MediaEngine
+
+    audio_files = list(dict.fromkeys(audio_files))
+    # files sharing a wav file would be converted concurrently, only the last one would be kept and, being up to date,
+    # the other ones would be skipped on the next run, so none of them is converted
+    collisions = find_output_collisions(audio_files)
+    colliding_files = {collision.audio_file for collision in collisions}
+    pending = []
+    for audio_file in audio_files:
+        output_path = audio_file.with_suffix('.wav')
+        if audio_file in colliding_files or audio_file.suffix.lower() in WAV_EXTENSIONS:
+            continue
+        if not force and is_up_to_date(audio_file, output_path):
+            continue
+        pending.append((audio_file, output_path))
+
+    progress = Progress(
+        TextColumn('[progress.description]{task.description}'),
+        BarColumn(),
+        MofNCompleteColumn(),
+        TimeElapsedColumn(),
+        TimeRemainingColumn(),
+        console=console,
+    )
+    with progress:
+        failures = asyncio.run(run_conversions(MediaEngine(jobs, timeout), pending, progress))
+
+    skipped = len(audio_files) - len(pending) - len(collisions)
+    return BatchResult(len(pending) - len(failures), skipped, collisions + failures)
+
+
+def print_failures(failures: list[ConversionError]) -> None:
+    error_console.print(f'[error]{len(failures)} file(s) could not be converted:')
+    for failure in sorted(failures, key=lambda failure: failure.audio_file):
+        lines = failure.output.strip().splitlines()
+        reason = lines[-1] if lines else 'unknown error'
+        error_console.print(f'  [bold]{failure.audio_file}[/]: {reason}', highlight=False)
 
 
 @click.command('to-wav')
-@click.argument('audio_file', type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.argument('sources', nargs=-1, required=True)
+@click.option(
+    '-o',
+    '--output-file',
+    type=click.Path(dir_okay=False, writable=True, path_type=Path),
+    help='The wav output file, only allowed when converting a single file.',
+)
 @click.option(
-    '-o', '--output-file', type=click.Path(dir_okay=False, writable=True, path_type=Path), help='The wav output file.'
+    '-j',
+    '--jobs',
+    type=click.IntRange(min=1),
+    default=os.cpu_count() or 1,
+    show_default='number of CPUs',
+    help='The number of files converted in parallel.',
 )
-def to_wav(audio_file: Path, output_file: Path):
+@click.option(
+    '-t',
+    '--timeout',
+    type=click.FloatRange(min=0, min_open=True),
+    help='The maximum time in seconds to convert a file, slower conversions are reported as failures.',
+)
+@click.option('-f', '--force', is_flag=True, help='Converts files even if their wav file is up to date.')
+def to_wav(sources: tuple[str, ...], output_file: Path | None, jobs: int, timeout: float | None, force: bool):
     """
-    Converts AUDIO_FILE to wav format.
+    Converts SOURCES to wav format.
+
+    When SOURCES are directories or glob patterns, each audio file found is converted in a wav file next to it. Like
+    make, files whose wav file is newer are skipped unless the --force option is passed. Conversion failures are
+    reported at the end.
 
     \b
     Arguments:
-        AUDIO_FILE    an audio file to convert in wav format.
+        SOURCES    audio files, directories or glob patterns to convert in wav format.
 
     Example usage:
 
@@ -28,6 +210,29 @@ def to_wav(audio_file: Path, output_file: Path):
     \b
     # creates output.wav from input.mp3
     $ son to-wav input.mp3 -o output.wav
+
+    \b
+    # converts all audio files in the music folder and its subfolders with 4 processes
+    $ son to-wav ~/Music -j 4
+
+    \b
+    # converts flac files of the current folder
+    $ son to-wav '*.flac'
     """
-    output_path = convert_to_wav(audio_file, output_file)
-    console.print(f'[success]Wav file [italic bold]{output_path}[/] was successfully created!')
+    if len(sources) == 1 and Path(sources[0]).is_file():
+        output_path = convert_to_wav(Path(sources[0]), output_file)
+        console.print(f'[success]Wav file [italic bold]{output_path}[/] was successfully created!')
+        return
+
+    if output_file is not None:
+        error_console.print('[error]The --output-file option can only be used to convert a single file.')
+        raise SystemExit(1)
+
+    audio_files = list(iter_audio_files(sources))
+    result = convert_files(audio_files, jobs, force, timeout)
+    console.print(
+        f'[success]{result.converted} file(s) converted, {result.skipped} up to date or already in wav format.'
+    )
+    if result.failures:
+        print_failures(result.failures)
+        raise SystemExit(1)
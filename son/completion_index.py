@@ -0,0 +1,88 @@
+# Flat files used by shell completion to suggest playlist names and song paths.
+# Completion runs son on every TAB, so it must not open the database: commands modifying playlists
+# rewrite these files and completion only reads them.
+import hashlib
+import os
+import shutil
+import tempfile
+from collections.abc import Iterable
+from pathlib import Path
+
+import click
+import platformdirs
+from click.shell_completion import CompletionItem
+
+
+def get_index_dir(data_dir: Path) -> Path:
+    return data_dir / 'completion'
+
+
+def _get_song_index_path(data_dir: Path, playlist_name: str) -> Path:
+    # playlist names can contain characters not allowed in file names
+    digest = hashlib.sha1(playlist_name.encode(), usedforsecurity=False).hexdigest()
+    return get_index_dir(data_dir) / 'songs' / f'{digest}.txt'
+
+
+def _write_lines(path: Path, lines: Iterable[str]) -> None:
+    # we write in a temporary file and rename it, so completion never reads a partially written file
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temporary_path = tempfile.mkstemp(dir=path.parent, prefix='.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.writelines(f'{line}\n' for line in lines)
+        os.replace(temporary_path, path)
+    except BaseException:
+        Path(temporary_path).unlink(missing_ok=True)
+        raise
+
+
+def _read_lines(path: Path) -> list[str]:
+    try:
+        return path.read_text(encoding='utf-8').splitlines()
+    except OSError:
+        return []
+
+
+def write_playlist_names(data_dir: Path, names: Iterable[str]) -> None:
+    _write_lines(get_index_dir(data_dir) / 'playlists.txt', names)
+
+
+def write_song_paths(data_dir: Path, playlist_name: str, song_paths: Iterable[str]) -> None:
+    _write_lines(_get_song_index_path(data_dir, playlist_name), song_paths)
+
+
+def remove_song_paths(data_dir: Path, playlist_name: str) -> None:
+    _get_song_index_path(data_dir, playlist_name).unlink(missing_ok=True)
+
+
+def clear_index(data_dir: Path) -> None:
+    shutil.rmtree(get_index_dir(data_dir), ignore_errors=True)
+
+
+def has_playlist_names(data_dir: Path) -> bool:
+    return (get_index_dir(data_dir) / 'playlists.txt').exists()
+
+
+def read_playlist_names(data_dir: Path) -> list[str]:
+    return _read_lines(get_index_dir(data_dir) / 'playlists.txt')
+
+
+def read_song_paths(data_dir: Path, playlist_name: str) -> list[str]:
+    return _read_lines(_get_song_index_path(data_dir, playlist_name))
+
+
+def complete_playlist_names(_ctx: click.Context, _param: click.Parameter, incomplete: str) -> list[CompletionItem]:
+    data_dir = platformdirs.user_data_path(appname='son')
+    return [CompletionItem(name) for name in read_playlist_names(data_dir) if name.startswith(incomplete)]
+
+
+def complete_song_paths(ctx: click.Context, _param: click.Parameter, incomplete: str) -> list[CompletionItem]:
+    playlist_name = ctx.params.get('name')
+    if playlist_name is None and ctx.args:
+        # click cannot parse a command line ending with an option waiting for its value,
+        # so the playlist name is left in the unparsed arguments
+        playlist_name = ctx.args[0]
+    if not playlist_name:
+        return []
+    data_dir = platformdirs.user_data_path(appname='son')
+    return [CompletionItem(path) for path in read_song_paths(data_dir, playlist_name) if path.startswith(incomplete)]
@@ -1,10 +1,11 @@
 import time
 
 from rich.console import Console
-from rich.progress import Progress
 from rich.style import Style
 from rich.theme import Theme
 
+from son.clock import countdown
+
 data = {
     'warning': Style(color='yellow'),
     'label': Style(color='yellow'),
@@ -17,9 +18,33 @@ console = Console(theme=custom_theme)
 error_console = Console(theme=Theme({'error': Style(color='red')}), stderr=True)
 
 
-def show_play_progress(duration: int, message: str, transient: bool = False) -> None:
-    with Progress(console=console, transient=transient) as progress:
-        task = progress.add_task(f'[info]Playing {message}', total=duration)
-        while not progress.finished:
-            progress.update(task, advance=1)
-            time.sleep(1)
+def show_progress(
+    description: str,
+    duration: float,
+    transient: bool = False,
+    deadline: float | None = None,
+    refresh_rate: float = 1,
+) -> None:
+    """
+    Shows a progress bar until the deadline, a time.monotonic value which defaults to "duration" seconds from now.
+
+    The bar is refreshed "refresh_rate" times per second. When the output is not a terminal, nothing is displayed
+    until the end, so we only wake up at the deadline.
+    """
+    # not imported at the module level since it is quite slow to import and not needed by most commands
+    from rich.progress import Progress
+
+    if deadline is None:
+        deadline = time.monotonic() + duration
+    interval = 1 / refresh_rate if console.is_terminal else None
+    # the bar is refreshed by us at each tick of the countdown, rich doesn't need its own refresh thread
+    with Progress(console=console, transient=transient, auto_refresh=False) as progress:
+        task = progress.add_task(description, total=duration)
+        for remaining in countdown(deadline, interval):
+            progress.update(task, completed=duration - remaining, refresh=True)
+
+
+def show_play_progress(
+    duration: float, message: str, transient: bool = False, deadline: float | None = None, refresh_rate: float = 1
+) -> None:
+    show_progress(f'[info]Playing {message}', duration, transient, deadline, refresh_rate)
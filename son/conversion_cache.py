@@ -0,0 +1,110 @@
+import hashlib
+import os
+import time
+import uuid
+from collections.abc import Callable
+from pathlib import Path
+
+from son.media_cache import get_cache_key
+
+
+class ConversionCache:
+    """
+    Directory of converted audio files, so a file is only converted once whatever the number of times it is played.
+
+    Entries are named after a hash of the source path, size, modification time, inode and conversion parameters, a
+    modified source therefore gets a new entry. Entries are written in a temporary file renamed once complete, so
+    concurrent son processes never read a partially converted file. The modification time of an entry is updated each
+    time it is used, and the least recently used entries are removed when the directory exceeds "max_size" bytes.
+    Temporary files left by killed processes are removed by "evict" and "clear" once they are "temporary_max_age"
+    seconds old, younger ones may belong to a conversion in progress.
+    """
+
+    suffix = '.wav'
+    temporary_max_age = 24 * 3600
+
+    def __init__(self, directory: Path, max_size: int):
+        self.directory = directory
+        self.max_size = max_size
+
+    def get_entry_path(self, audio_file: Path, parameters: str) -> Path:
+        key = '\0'.join(str(part) for part in (*get_cache_key(audio_file), parameters))
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return self.directory / digest[:2] / f'{digest}{self.suffix}'
+
+    def get_or_convert(self, audio_file: Path, convert: Callable[[Path, Path], object], parameters: str) -> Path:
+        """
+        Returns the converted file of "audio_file", calling "convert(audio_file, output_path)" if it is not cached.
+        """
+        entry_path = self.get_entry_path(audio_file, parameters)
+        try:
+            os.utime(entry_path)
+            return entry_path
+        except FileNotFoundError:
+            pass
+
+        entry_path.parent.mkdir(parents=True, exist_ok=True)
+        # the temporary file keeps the suffix, ffmpeg guesses the output format from it
+        temporary_path = entry_path.with_name(f'.{uuid.uuid4().hex}{self.suffix}')
+        try:
+            convert(audio_file, temporary_path)
+            os.replace(temporary_path, entry_path)
+        finally:
+            temporary_path.unlink(missing_ok=True)
+        self.evict(keep=entry_path)
+        return entry_path
+
+    def _get_entries(self) -> list[tuple[Path, os.stat_result]]:
+        entries = []
+        for path in self.directory.glob(f'*/*{self.suffix}'):
+            # temporary files of conversions are hidden
+            if path.name.startswith('.'):
+                continue
+            try:
+                entries.append((path, path.stat()))
+            except FileNotFoundError:
+                # removed by another son process
+                continue
+        return entries
+
+    def _remove_stale_temporary_files(self) -> int:
+        """Removes temporary files older than "temporary_max_age" and returns their number."""
+        deadline = time.time() - self.temporary_max_age
+        count = 0
+        for path in self.directory.glob(f'*/.*{self.suffix}'):
+            try:
+                if path.stat().st_mtime < deadline:
+                    path.unlink()
+                    count += 1
+            except FileNotFoundError:
+                # renamed or removed by the process converting it
+                continue
+        return count
+
+    def evict(self, keep: Path | None = None) -> int:
+        """
+        Removes the least recently used entries exceeding "max_size" and stale temporary files, and returns their
+        number.
+        """
+        count = self._remove_stale_temporary_files()
+        entries = self._get_entries()
+        total_size = sum(stat.st_size for _, stat in entries)
+        for path, stat in sorted(entries, key=lambda entry: entry[1].st_mtime_ns):
+            if total_size <= self.max_size:
+                break
+            if path == keep:
+                continue
+            path.unlink(missing_ok=True)
+            total_size -= stat.st_size
+            count += 1
+        return count
+
+    def clear(self) -> int:
+        entries = self._get_entries()
+        for path, _ in entries:
+            path.unlink(missing_ok=True)
+        return len(entries) + self._remove_stale_temporary_files()
+
+    def stats(self) -> dict[str, int]:
+        entries = self._get_entries()
+        return {'entries': len(entries), 'size': sum(stat.st_size for _, stat in entries)}
@@ -1,9 +1,44 @@
+import functools
+import posixpath
+import random
+import sqlite3
+import time
+from collections.abc import Callable
 from datetime import datetime
+from pathlib import Path
+from typing import ParamSpec, TypeVar
 
-from alchemical import Model
-from sqlalchemy import DateTime, ForeignKey, Integer, String, UniqueConstraint, func
+from alchemical import Alchemical, Model
+from sqlalchemy import (
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    UniqueConstraint,
+    column,
+    event,
+    func,
+    table,
+)
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
+P = ParamSpec('P')
+R = TypeVar('R')
+
+# seconds a connection waits for a lock held by another son process before giving up
+BUSY_TIMEOUT = 30
+BUSY_RETRIES = 5
+SQLITE_PRAGMAS = {
+    # readers don't block the writer and the writer doesn't block readers
+    'journal_mode': 'WAL',
+    # in WAL mode, NORMAL is safe against corruption and avoids a fsync per transaction
+    'synchronous': 'NORMAL',
+    # negative values are in KiB, so 16 MiB of page cache
+    'cache_size': -16_000,
+}
+
 
 class Playlist(Model):
     id: Mapped[int] = mapped_column(primary_key=True)
@@ -12,23 +47,287 @@ class Playlist(Model):
         DateTime(timezone=True), nullable=False, index=True, default=func.now()
     )
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=True, onupdate=func.now())
-    songs: Mapped[list['Song']] = relationship(back_populates='playlist', cascade='all, delete-orphan')
+    # aggregates of the playlist tracks, maintained by the triggers of PLAYLIST_TRIGGERS
+    song_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default='0')
+    total_duration: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default='0')
+    tracks: Mapped[list['PlaylistTrack']] = relationship(
+        back_populates='playlist', cascade='all, delete-orphan', order_by='PlaylistTrack.position'
+    )
+    folders: Mapped[list['PlaylistFolder']] = relationship(back_populates='playlist', cascade='all, delete-orphan')
 
     def __repr__(self) -> str:
         return f'Playlist(id={self.id!r}, name={self.name!r})'
 
 
-class Song(Model):
+class Track(Model):
+    """An audio file of the library, it is stored and probed once whatever the number of playlists containing it."""
+
     id: Mapped[int] = mapped_column(primary_key=True)
-    path: Mapped[str] = mapped_column(String(200), nullable=False, index=True)
-    created_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True), nullable=False, index=True, default=func.now()
-    )
+    path: Mapped[str] = mapped_column(String, nullable=False, index=True, unique=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, default=func.now())
     duration: Mapped[int] = mapped_column(Integer, nullable=False)
+    # snapshot of the file when it was probed, a track whose file changed is probed again
+    size: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    mtime_ns: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    playlists: Mapped[list['PlaylistTrack']] = relationship(back_populates='track')
+
+    def __repr__(self) -> str:
+        return f'Track(id={self.id!r}, path={self.path!r})'
+
+
+class PlaylistTrack(Model):
+    """Membership of a track in a playlist, tracks are played by increasing position."""
+
+    __tablename__ = 'playlist_track'
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    playlist_id: Mapped[int] = mapped_column(ForeignKey('playlist.id'))
+    track_id: Mapped[int] = mapped_column(ForeignKey('track.id'), index=True)
+    position: Mapped[int] = mapped_column(Integer, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, default=func.now())
+    playlist: Mapped['Playlist'] = relationship(back_populates='tracks')
+    track: Mapped['Track'] = relationship(back_populates='playlists')
+
+    __table_args__ = (
+        UniqueConstraint('playlist_id', 'track_id', name='_playlist_track_uc'),
+        Index('ix_playlist_track_position', 'playlist_id', 'position'),
+    )
+
+    def __repr__(self) -> str:
+        return f'PlaylistTrack(id={self.id!r}, position={self.position!r})'
+
+
+class PlaylistFolder(Model):
+    __tablename__ = 'playlist_folder'
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    path: Mapped[str] = mapped_column(String(200), nullable=False)
     playlist_id: Mapped[int] = mapped_column(ForeignKey('playlist.id'))
-    playlist: Mapped['Playlist'] = relationship(back_populates='songs')
+    playlist: Mapped['Playlist'] = relationship(back_populates='folders')
 
-    __table_args__ = (UniqueConstraint('path', 'playlist_id', name='_playlist_song_uc'),)
+    __table_args__ = (UniqueConstraint('path', 'playlist_id', name='_playlist_folder_uc'),)
 
     def __repr__(self) -> str:
-        return f'Song(id={self.id!r}, path={self.path!r})'
+        return f'PlaylistFolder(id={self.id!r}, path={self.path!r})'
+
+
+# Triggers keeping "song_count" and "total_duration" of playlists up to date, whatever the statement changing tracks
+# or memberships. A membership whose track was already deleted counts for a null duration.
+PLAYLIST_TRIGGERS = [
+    (
+        'CREATE TRIGGER playlist_track_insert AFTER INSERT ON playlist_track BEGIN'
+        ' UPDATE playlist SET song_count = song_count + 1,'
+        ' total_duration = total_duration + coalesce((SELECT duration FROM track WHERE id = NEW.track_id), 0)'
+        ' WHERE id = NEW.playlist_id;'
+        ' END'
+    ),
+    (
+        'CREATE TRIGGER playlist_track_delete AFTER DELETE ON playlist_track BEGIN'
+        ' UPDATE playlist SET song_count = song_count - 1,'
+        ' total_duration = total_duration - coalesce((SELECT duration FROM track WHERE id = OLD.track_id), 0)'
+        ' WHERE id = OLD.playlist_id;'
+        ' END'
+    ),
+    (
+        'CREATE TRIGGER track_duration_update AFTER UPDATE OF duration ON track WHEN NEW.duration != OLD.duration BEGIN'
+        ' UPDATE playlist SET total_duration = total_duration + NEW.duration - OLD.duration'
+        ' WHERE id IN (SELECT playlist_id FROM playlist_track WHERE track_id = NEW.id);'
+        ' END'
+    ),
+]
+# statement recomputing the aggregates of all playlists from their memberships
+REFRESH_PLAYLIST_AGGREGATES = (
+    'UPDATE playlist SET'
+    ' song_count = (SELECT count(*) FROM playlist_track WHERE playlist_id = playlist.id),'
+    ' total_duration = (SELECT coalesce(sum(track.duration), 0) FROM playlist_track'
+    ' JOIN track ON track.id = playlist_track.track_id WHERE playlist_id = playlist.id)'
+)
+
+
+def get_track_title(path: str) -> str:
+    """Returns the title of a track, the name of its file without extension."""
+    # paths are stored in posix form, this is cheaper than building a Path for each track
+    return posixpath.splitext(posixpath.basename(path))[0]
+
+
+def _get_title_sql(path: str) -> str:
+    """Returns a SQL expression computing the title of the track of the "path" expression, like get_track_title."""
+    # rtrim removes the characters of its second argument, so removing all characters but "/" (or ".") from the end
+    # gives the prefix ending with the last "/" (or ".")
+    file_name = f"substr({path}, length(rtrim({path}, replace({path}, '/', ''))) + 1)"
+    stem_prefix = f"rtrim({file_name}, replace({file_name}, '.', ''))"
+    stem = f'substr({file_name}, 1, length({stem_prefix}) - 1)'
+    return f'CASE WHEN length({stem_prefix}) > 1 THEN {stem} ELSE {file_name} END'
+
+
+# Full-text index of track titles and paths, the rowid of an entry is the id of its track. Triggers keep it in sync
+# with the track table. Prefix indexes make prefix queries like "floy*" as fast as token queries.
+TRACK_FTS_TABLE = (
+    'CREATE VIRTUAL TABLE track_fts USING fts5(title, path, tokenize="unicode61 remove_diacritics 2", prefix="2 3")'
+)
+TRACK_FTS_TRIGGERS = [
+    (
+        'CREATE TRIGGER track_fts_insert AFTER INSERT ON track BEGIN'  # noqa: S608
+        f' INSERT INTO track_fts (rowid, title, path) VALUES (NEW.id, {_get_title_sql("NEW.path")}, NEW.path);'
+        ' END'
+    ),
+    'CREATE TRIGGER track_fts_delete AFTER DELETE ON track BEGIN DELETE FROM track_fts WHERE rowid = OLD.id; END',
+    (
+        'CREATE TRIGGER track_fts_update AFTER UPDATE OF path ON track BEGIN'  # noqa: S608
+        f' UPDATE track_fts SET title = {_get_title_sql("NEW.path")}, path = NEW.path WHERE rowid = NEW.id;'
+        ' END'
+    ),
+]
+# SQLAlchemy cannot create virtual tables, this lightweight table is only used to query it
+track_fts = table('track_fts', column('rowid', Integer), column('rank'))
+
+# Each migration is a list of SQL statements bringing the schema from version N to N + 1, the version being stored
+# in the "user_version" pragma. Databases created from scratch get the last version directly, so models and
+# migrations must always describe the same schema.
+MIGRATIONS: list[list[str]] = [
+    # 1: folders linked to playlists and file snapshots for "playlist sync"
+    [
+        'ALTER TABLE song ADD COLUMN size INTEGER',
+        'ALTER TABLE song ADD COLUMN mtime_ns INTEGER',
+        (
+            'CREATE TABLE playlist_folder ('
+            ' id INTEGER NOT NULL PRIMARY KEY,'
+            ' path VARCHAR(200) NOT NULL,'
+            ' playlist_id INTEGER NOT NULL REFERENCES playlist (id),'
+            ' CONSTRAINT _playlist_folder_uc UNIQUE (path, playlist_id))'
+        ),
+    ],
+    # 2: songs split in a library of tracks and playlist memberships, each path keeps its oldest song
+    [
+        (
+            'CREATE TABLE track ('
+            ' id INTEGER NOT NULL PRIMARY KEY,'
+            ' path VARCHAR NOT NULL,'
+            ' created_at DATETIME NOT NULL,'
+            ' duration INTEGER NOT NULL,'
+            ' size INTEGER,'
+            ' mtime_ns INTEGER)'
+        ),
+        'CREATE UNIQUE INDEX ix_track_path ON track (path)',
+        (
+            'INSERT INTO track (path, created_at, duration, size, mtime_ns)'
+            ' SELECT path, created_at, duration, size, mtime_ns FROM song'
+            ' WHERE id IN (SELECT min(id) FROM song GROUP BY path) ORDER BY id'
+        ),
+        (
+            'CREATE TABLE playlist_track ('
+            ' id INTEGER NOT NULL PRIMARY KEY,'
+            ' playlist_id INTEGER NOT NULL REFERENCES playlist (id),'
+            ' track_id INTEGER NOT NULL REFERENCES track (id),'
+            ' position INTEGER NOT NULL,'
+            ' created_at DATETIME NOT NULL,'
+            ' CONSTRAINT _playlist_track_uc UNIQUE (playlist_id, track_id))'
+        ),
+        'CREATE INDEX ix_playlist_track_track_id ON playlist_track (track_id)',
+        'CREATE INDEX ix_playlist_track_position ON playlist_track (playlist_id, position)',
+        (
+            'INSERT INTO playlist_track (playlist_id, track_id, position, created_at)'
+            ' SELECT song.playlist_id, track.id, row_number() OVER (PARTITION BY song.playlist_id ORDER BY song.id),'
+            ' song.created_at FROM song JOIN track ON track.path = song.path ORDER BY song.id'
+        ),
+        'DROP TABLE song',
+    ],
+    # 3: song count and total duration of playlists
+    [
+        "ALTER TABLE playlist ADD COLUMN song_count INTEGER DEFAULT '0' NOT NULL",
+        "ALTER TABLE playlist ADD COLUMN total_duration INTEGER DEFAULT '0' NOT NULL",
+        REFRESH_PLAYLIST_AGGREGATES,
+        *PLAYLIST_TRIGGERS,
+    ],
+    # 4: full-text index of tracks
+    [
+        TRACK_FTS_TABLE,
+        f'INSERT INTO track_fts (rowid, title, path) SELECT id, {_get_title_sql("path")}, path FROM track',  # noqa: S608
+        *TRACK_FTS_TRIGGERS,
+    ],
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def set_sqlite_pragmas(dbapi_connection: sqlite3.Connection, _connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f'PRAGMA {name}={value}')
+    cursor.close()
+
+
+def create_database(db_path: Path) -> Alchemical:
+    db = Alchemical(f'sqlite:///{db_path}', engine_options={'connect_args': {'timeout': BUSY_TIMEOUT}})
+    event.listen(db.get_engine(), 'connect', set_sqlite_pragmas)
+    return db
+
+
+def init_database(db: Alchemical) -> None:
+    db.create_all()
+    with db.get_engine().begin() as connection:
+        for statement in [*PLAYLIST_TRIGGERS, TRACK_FTS_TABLE, *TRACK_FTS_TRIGGERS]:
+            connection.exec_driver_sql(statement)
+        connection.exec_driver_sql(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+
+def migrate_database(db: Alchemical) -> None:
+    """Applies migrations the database misses, it is a single pragma read when the schema is up to date."""
+    with db.get_engine().connect() as connection:
+        version = connection.exec_driver_sql('PRAGMA user_version').scalar()
+    if version >= SCHEMA_VERSION:
+        return
+
+    # the raw connection is used because the sqlite3 module commits implicitly before DDL statements, an immediate
+    # transaction makes the migration atomic and stops other son processes from migrating at the same time
+    connection = db.get_engine().raw_connection()
+    try:
+        sqlite_connection = connection.driver_connection
+        isolation_level = sqlite_connection.isolation_level
+        sqlite_connection.isolation_level = None
+        sqlite_connection.execute('BEGIN IMMEDIATE')
+        try:
+            # another process may have migrated the database while we were waiting for the lock
+            (version,) = sqlite_connection.execute('PRAGMA user_version').fetchone()
+            for statements in MIGRATIONS[version:]:
+                for statement in statements:
+                    sqlite_connection.execute(statement)
+            sqlite_connection.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+            sqlite_connection.execute('COMMIT')
+        except BaseException:
+            sqlite_connection.execute('ROLLBACK')
+            raise
+        finally:
+            sqlite_connection.isolation_level = isolation_level
+    finally:
+        connection.close()
+
+
+def is_busy_error(error: OperationalError) -> bool:
+    return isinstance(error.orig, sqlite3.OperationalError) and (
+        'database is locked' in str(error.orig) or 'database is busy' in str(error.orig)
+    )
+
+
+def retry_on_busy(func: Callable[P, R]) -> Callable[P, R]:
+    """
+    Retries a function running a write transaction when the database is locked by another son process.
+
+    The busy timeout already makes connections wait for locks, but a transaction which started by reading cannot
+    wait when it needs to write after another process committed, SQLite fails right away in this case. The decorated
+    function must run the whole transaction, so that it can be replayed from the beginning.
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+        attempt = 0
+        while True:
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as e:
+                attempt += 1
+                if not is_busy_error(e) or attempt == BUSY_RETRIES:
+                    raise
+            # exponential backoff with jitter, so that concurrent processes don't retry at the same time
+            time.sleep(0.05 * 2**attempt + random.uniform(0, 0.05))  # noqa: S311
+
+    return wrapper
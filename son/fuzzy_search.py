@@ -0,0 +1,32 @@
+from collections.abc import Iterable
+from typing import Generic, TypeVar
+
+from rapidfuzz import fuzz, process, utils
+
+T = TypeVar('T')
+
+
+class FuzzyIndex(Generic[T]):
+    """
+    Fuzzy search over strings, each one associated with a value returned by searches.
+
+    Strings are preprocessed (lowercased, non alphanumeric characters removed) once when the index is built, so a
+    search only scores them.
+    """
+
+    def __init__(self, items: Iterable[tuple[str, T]]):
+        self._choices: list[str] = []
+        self._values: list[T] = []
+        for choice, value in items:
+            self._choices.append(utils.default_process(choice))
+            self._values.append(value)
+
+    def __len__(self) -> int:
+        return len(self._choices)
+
+    def search(self, query: str, limit: int) -> list[tuple[T, float]]:
+        """Returns values of the "limit" best matches of query with their score, the best first."""
+        results = process.extract(
+            utils.default_process(query), self._choices, scorer=fuzz.WRatio, processor=None, limit=limit
+        )
+        return [(self._values[index], score) for _, score, index in results]
@@ -1,31 +1,97 @@
+from functools import cached_property
+from typing import TYPE_CHECKING
+
 import click
 import platformdirs
-from alchemical import Alchemical
-from click_didyoumean import DYMGroup
+from click_didyoumean import DYMMixin
+
+from son.commands.lazy import LazyGroup
+
+if TYPE_CHECKING:
+    from alchemical import Alchemical
 
-from son.commands.completion import install_completion
-from son.commands.play import play
-from son.commands.playlist import playlist
-from son.commands.pomodoro import pomodoro
-from son.commands.to_wav import to_wav
-from son.console import console
-from son.settings import Settings
+    from son.conversion_cache import ConversionCache
+    from son.media_cache import MediaCache
+    from son.settings import Settings
+
+
+class SonGroup(DYMMixin, LazyGroup):
+    pass
 
 
 class Container:
+    """
+    Holds objects shared by commands.
+
+    They are created on first access, so commands not needing the database or the settings don't pay for their
+    initialization.
+    """
+
     def __init__(self):
-        self.settings = Settings()
-        son_data_dir = platformdirs.user_data_path(appname='son')
-        db_path = son_data_dir / 'son.db'
-        self.db = Alchemical(f'sqlite:///{db_path}')
-        if not son_data_dir.exists():
-            son_data_dir.mkdir(parents=True, exist_ok=True)
+        self.data_dir = platformdirs.user_data_path(appname='son')
+
+    @cached_property
+    def settings(self) -> 'Settings':
+        from son.settings import Settings
+
+        return Settings()
+
+    @cached_property
+    def db(self) -> 'Alchemical':
+        from son.completion_index import has_playlist_names
+        from son.console import console
+        from son.database import create_database, init_database, migrate_database
+
+        db_path = self.data_dir / 'son.db'
+        db = create_database(db_path)
+        # the data directory may already have been created by the media cache, so we check the database file
+        if not db_path.exists():
+            self.data_dir.mkdir(parents=True, exist_ok=True)
             console.print(f'[info]Initializing database at {db_path}')
-            self.db.create_all()
+            init_database(db)
+        else:
+            migrate_database(db)
+        # the index is only written by commands modifying playlists, so databases created by a version of son without
+        # the index, or an index removed by hand, would give no completion until the next modification
+        if not has_playlist_names(self.data_dir):
+            from son.commands.playlist.queries import rebuild_completion_index
+
+            rebuild_completion_index(db, self.data_dir)
+        return db
+
+    @cached_property
+    def media_cache(self) -> 'MediaCache':
+        from son.media_cache import MediaCache
+
+        return MediaCache(self.data_dir / 'media.db', self.settings.media_cache_size)
+
+    @cached_property
+    def conversion_cache(self) -> 'ConversionCache':
+        from son.conversion_cache import ConversionCache
+
+        directory = platformdirs.user_cache_path(appname='son') / 'conversions'
+        return ConversionCache(directory, self.settings.conversion_cache_size * 1024 * 1024)
+
+    def close(self) -> None:
+        # we don't want to create the media cache just to close it
+        if 'media_cache' in self.__dict__:
+            self.media_cache.close()
 
 
 @click.version_option('0.1.0', message='%(prog)s version %(version)s')
-@click.group(cls=DYMGroup, context_settings={'help_option_names': ['-h', '--help']})
+@click.group(
+    cls=SonGroup,
+    lazy_subcommands={
+        'cache': 'son.commands.cache:cache',
+        'install-completion': 'son.commands.completion:install_completion',
+        'play': 'son.commands.play:play',
+        'playlist': 'son.commands.playlist:playlist',
+        'pomodoro': 'son.commands.pomodoro:pomodoro',
+        'search': 'son.commands.search:search',
+        'to-wav': 'son.commands.to_wav:to_wav',
+    },
+    context_settings={'help_option_names': ['-h', '--help']},
+)
 @click.pass_context
 def cli(context: click.Context):
     """
@@ -55,7 +121,4 @@ def cli(context: click.Context):
     $ son pomodoro
     """
     context.obj = Container()
-
-
-for command in [install_completion, play, to_wav, pomodoro, playlist]:
-    cli.add_command(command)
+    context.call_on_close(context.obj.close)
@@ -1,60 +1,261 @@
-# ruff: noqa: S603, S607
+# ruff: noqa: S603
+import json
 import math
+import os
 import platform
-import re
+import struct
 import subprocess
-from datetime import datetime, timedelta
+from collections.abc import Iterator
+from dataclasses import dataclass
 from pathlib import Path
+from typing import TYPE_CHECKING, BinaryIO
 
 from son.console import console, error_console
-from son.settings import Settings
 
+if TYPE_CHECKING:
+    from son.conversion_cache import ConversionCache
+    from son.media_cache import MediaCache
+    from son.settings import Settings
 
-def get_seconds_from_str_time(str_time: str) -> float:
-    """Converts a string time in format hh:mm:ss.ss into seconds"""
-    time_format = datetime.strptime(str_time, '%H:%M:%S.%f')
-    delta = timedelta(
-        hours=time_format.hour,
-        minutes=time_format.minute,
-        seconds=time_format.second,
-        microseconds=time_format.microsecond,
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_ALAW = 0x0006
+WAVE_FORMAT_MULAW = 0x0007
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+WAV_CODECS = {WAVE_FORMAT_ALAW: 'pcm_alaw', WAVE_FORMAT_MULAW: 'pcm_mulaw'}
+WAV_EXTENSIONS = ('.wav', '.wave')
+# identifies the ffmpeg conversion in the conversion cache, it must change if the ffmpeg command changes
+WAV_CONVERSION_PARAMETERS = 'ffmpeg:wav'
+
+
+@dataclass(frozen=True)
+class MediaInfo:
+    duration: float
+    sample_rate: int | None = None
+    channels: int | None = None
+    frames: int | None = None
+    codec: str | None = None
+
+
+def _get_wav_codec(audio_format: int, bits_per_sample: int) -> str | None:
+    if audio_format == WAVE_FORMAT_PCM:
+        return 'pcm_u8' if bits_per_sample == 8 else f'pcm_s{bits_per_sample}le'
+    if audio_format == WAVE_FORMAT_IEEE_FLOAT:
+        return f'pcm_f{bits_per_sample}le'
+    return WAV_CODECS.get(audio_format)
+
+
+def _iter_riff_chunks(file: BinaryIO, file_size: int) -> Iterator[tuple[bytes, int, int]]:
+    """Yields (chunk id, chunk data offset, chunk size) for each chunk following the RIFF/WAVE header."""
+    offset = 12
+    while offset + 8 <= file_size:
+        file.seek(offset)
+        chunk_id, chunk_size = struct.unpack('<4sI', file.read(8))
+        yield chunk_id, offset + 8, chunk_size
+        # chunks are word aligned, odd sized chunks are followed by a padding byte
+        offset += 8 + chunk_size + (chunk_size & 1)
+
+
+def _read_wav_chunks(file: BinaryIO) -> tuple[bytes | None, int | None, int | None]:
+    """Returns the raw "fmt " chunk, the data size and the "fact" frame count of a wav file."""
+    file_size = os.fstat(file.fileno()).st_size
+    header = file.read(12)
+    if len(header) < 12 or header[:4] not in (b'RIFF', b'RF64') or header[8:] != b'WAVE':
+        return None, None, None
+
+    fmt = data_size = fact_frames = rf64_data_size = None
+    for chunk_id, data_offset, chunk_size in _iter_riff_chunks(file, file_size):
+        if chunk_id == b'ds64' and chunk_size >= 16:
+            # RF64 files store 64-bit sizes here and put 0xFFFFFFFF in the 32-bit size fields
+            _, rf64_data_size = struct.unpack('<QQ', file.read(16))
+        elif chunk_id == b'fmt ' and chunk_size >= 16:
+            fmt = file.read(min(chunk_size, 40))
+        elif chunk_id == b'fact' and chunk_size >= 4:
+            (fact_frames,) = struct.unpack('<I', file.read(4))
+        elif chunk_id == b'data':
+            if chunk_size == 0xFFFFFFFF and rf64_data_size is not None:
+                chunk_size = rf64_data_size
+            elif chunk_size in (0, 0xFFFFFFFF):
+                # streamed files do not know the data size when writing the header
+                chunk_size = file_size - data_offset
+            # truncated files may announce more data than really present
+            data_size = min(chunk_size, file_size - data_offset)
+            # some writers put the "fmt " chunk after the data one, so we keep looking for it
+            if fmt is not None:
+                break
+    return fmt, data_size, fact_frames
+
+
+def read_wav_info(audio_file: Path) -> MediaInfo | None:
+    """
+    Computes media information of a wav file by reading its RIFF chunks.
+
+    Returns None if the file is not a wav file this function knows how to handle.
+    """
+    try:
+        with audio_file.open('rb') as file:
+            fmt, data_size, fact_frames = _read_wav_chunks(file)
+    except (OSError, struct.error):
+        return None
+
+    if fmt is None or data_size is None:
+        return None
+
+    audio_format, channels, sample_rate, _, block_align, bits_per_sample = struct.unpack('<HHIIHH', fmt[:16])
+    if audio_format == WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+        # the real format is given by the first two bytes of the sub-format GUID
+        (audio_format,) = struct.unpack('<H', fmt[24:26])
+
+    if not sample_rate or not channels:
+        return None
+    if audio_format in (WAVE_FORMAT_PCM, WAVE_FORMAT_IEEE_FLOAT, WAVE_FORMAT_ALAW, WAVE_FORMAT_MULAW):
+        if not block_align:
+            return None
+        frames = data_size // block_align
+    elif fact_frames is not None:
+        # compressed formats tell the number of frames in the "fact" chunk
+        frames = fact_frames
+    else:
+        return None
+
+    return MediaInfo(
+        duration=frames / sample_rate,
+        sample_rate=sample_rate,
+        channels=channels,
+        frames=frames,
+        codec=_get_wav_codec(audio_format, bits_per_sample),
     )
-    return delta.total_seconds()
 
 
-def get_media_duration(audio_file: Path) -> int:
-    result = subprocess.run(['ffmpeg', '-i', audio_file], stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
-    output = result.stdout.decode()
-    matches = re.search(r'Duration: (\d{2}:\d{2}:\d{2}.\d{2})', output)
-    if matches:
-        # a fraction of a second is not really important, we just consider the lower integer
-        # value for simplicity
-        return math.floor(get_seconds_from_str_time(matches.group(1)))
+def get_ffprobe_command(audio_file: Path) -> list[str | Path]:
+    return [
+        'ffprobe',
+        '-v',
+        'error',
+        '-select_streams',
+        'a:0',
+        '-show_entries',
+        'format=duration:stream=codec_name,sample_rate,channels,duration_ts,time_base',
+        '-of',
+        'json',
+        audio_file,
+    ]
+
 
-    error_console.print(f'[error]Unable not parse duration for file: [bold]{audio_file}[/], ffmpeg output\n: {output}')
-    raise SystemExit(1)
+def parse_ffprobe_output(output: str) -> MediaInfo:
+    """Builds media information from the ffprobe json output, raises ValueError if the duration is missing."""
+    try:
+        data = json.loads(output)
+        duration = float(data['format']['duration'])
+    except (KeyError, TypeError) as e:
+        raise ValueError('no duration in ffprobe output') from e
+
+    stream = data.get('streams', [{}])[0] if data.get('streams') else {}
+    sample_rate = int(stream['sample_rate']) if stream.get('sample_rate') else None
+    frames = round(duration * sample_rate) if sample_rate else None
+    return MediaInfo(
+        duration=duration,
+        sample_rate=sample_rate,
+        channels=stream.get('channels'),
+        frames=frames,
+        codec=stream.get('codec_name'),
+    )
+
+
+def probe_media_info(audio_file: Path) -> MediaInfo:
+    """Computes media information with ffprobe, this is the slow path for files not handled by read_wav_info."""
+    # ffprobe logs problems like damaged frames on stderr, they must not be mixed with the json output
+    result = subprocess.run(get_ffprobe_command(audio_file), capture_output=True, check=False)
+    try:
+        return parse_ffprobe_output(result.stdout.decode())
+    except ValueError:
+        error_console.print(
+            f'[error]Unable not parse duration for file: [bold]{audio_file}[/], ffprobe output\n:'
+            f' {result.stderr.decode(errors="replace")}'
+        )
+        raise SystemExit(1) from None
+
+
+def get_media_info(audio_file: Path, cache: 'MediaCache | None' = None) -> MediaInfo:
+    if cache is not None and (info := cache.get(audio_file)) is not None:
+        return info
+
+    info = read_wav_info(audio_file)
+    if info is None:
+        info = probe_media_info(audio_file)
+    if cache is not None:
+        cache.set(audio_file, info)
+    return info
+
+
+def get_media_duration(audio_file: Path, cache: 'MediaCache | None' = None) -> int:
+    # a fraction of a second is not really important, we just consider the lower integer
+    # value for simplicity
+    return math.floor(get_media_info(audio_file, cache).duration)
 
 
 def convert_to_wav(audio_file: Path, output_file: Path | None = None) -> Path:
     output_path = output_file if output_file else audio_file.with_suffix('.wav')
     console.print(f'[info]Creating [bold]{output_path}[/] from [bold]{audio_file}[/]...')
+    return run_wav_conversion(audio_file, output_path)
+
+
+def run_wav_conversion(audio_file: Path, output_path: Path) -> Path:
+    try:
+        transcode_to_wav(audio_file, output_path)
+    except ConversionError as e:
+        error_console.print(f'[error]Unable to convert [bold]{audio_file}[/], ffmpeg error:\n {e.output}')
+        raise SystemExit(1) from None
+    return output_path
+
+
+class ConversionError(Exception):
+    def __init__(self, audio_file: Path, output: str):
+        super().__init__(f'unable to convert {audio_file}')
+        self.audio_file = audio_file
+        self.output = output
+
+
+def get_wav_conversion_command(audio_file: Path, output_path: Path) -> list[str | Path]:
+    return ['ffmpeg', '-i', audio_file, output_path]
+
+
+def transcode_to_wav(audio_file: Path, output_path: Path) -> None:
+    """Converts "audio_file" with ffmpeg, raising ConversionError instead of exiting so callers can carry on."""
     try:
         subprocess.run(
-            ['ffmpeg', '-i', audio_file, output_path], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, check=True
+            get_wav_conversion_command(audio_file, output_path),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            check=True,
         )
     except subprocess.CalledProcessError as e:
-        error_console.print(f'[error]Unable to convert [bold]{audio_file}[/], ffmpeg error:\n {e.stdout.decode()}')
-        raise SystemExit(1) from None
-    return output_path
+        raise ConversionError(audio_file, e.stdout.decode(errors='replace')) from None
+    except FileNotFoundError:
+        raise ConversionError(audio_file, 'ffmpeg is not installed') from None
 
 
 def is_nava_compatible(audio_file: Path) -> bool:
-    if audio_file.suffix == '.wav' or (audio_file.suffix == '.mp3' and platform.platform() == 'Darwin'):
+    suffix = audio_file.suffix.lower()
+    if suffix in WAV_EXTENSIONS or (suffix == '.mp3' and platform.platform() == 'Darwin'):
         return True
     return False
 
 
-def get_compatible_nava_file_or_raise_error(audio_file: Path, settings: Settings) -> Path:
+def convert_to_cached_wav(audio_file: Path, conversion_cache: 'ConversionCache') -> Path:
+    entry_path = conversion_cache.get_entry_path(audio_file, WAV_CONVERSION_PARAMETERS)
+    if not entry_path.exists():
+        console.print(f'[info]Converting [bold]{audio_file}[/] to the wav format...')
+    return conversion_cache.get_or_convert(audio_file, run_wav_conversion, WAV_CONVERSION_PARAMETERS)
+
+
+def get_compatible_nava_file_or_raise_error(
+    audio_file: Path, settings: 'Settings', conversion_cache: 'ConversionCache | None' = None
+) -> Path:
+    """
+    Returns a file nava can play, converting "audio_file" in the conversion cache if given, or next to it otherwise.
+    """
     if is_nava_compatible(audio_file):
         return audio_file
 
@@ -64,4 +265,6 @@ def get_compatible_nava_file_or_raise_error(audio_file: Path, settings: Settings
             ' activated.\n You may want to convert the audio first with the [bold]to-wav[/] command.'
         )
         raise SystemExit(1) from None
-    return convert_to_wav(audio_file)
+    if conversion_cache is None:
+        return convert_to_wav(audio_file)
+    return convert_to_cached_wav(audio_file, conversion_cache)
@@ -0,0 +1,167 @@
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from son.media import MediaInfo
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS media (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    duration REAL NOT NULL,
+    sample_rate INTEGER,
+    channels INTEGER,
+    frames INTEGER,
+    codec TEXT,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_media_accessed_at ON media (accessed_at);
+CREATE TABLE IF NOT EXISTS counter (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+CacheKey = tuple[str, int, int, int]
+
+
+def get_cache_key(audio_file: Path) -> CacheKey:
+    """Returns the (resolved path, size, mtime_ns, inode) tuple identifying the current state of a file."""
+    path = audio_file.resolve()
+    stat = path.stat()
+    return path.as_posix(), stat.st_size, stat.st_mtime_ns, stat.st_ino
+
+
+class MediaCache:
+    """
+    Persistent cache of media information stored in a sqlite database.
+
+    An entry is only returned if the size, modification time and inode of the file did not change since it was
+    stored, so there is no need to invalidate entries when files are modified. The cache keeps at most
+    "max_entries" entries, the least recently used ones are evicted when it is closed.
+    """
+
+    def __init__(self, path: Path, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._accessed: dict[str, float] = {}
+        self._connection: sqlite3.Connection | None = None
+        # the cache may be shared by threads probing songs in parallel
+        self._lock = threading.Lock()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.executescript(SCHEMA)
+            self._connection = connection
+        return self._connection
+
+    def get(self, audio_file: Path) -> MediaInfo | None:
+        try:
+            path, size, mtime_ns, inode = get_cache_key(audio_file)
+        except OSError:
+            return None
+
+        with self._lock:
+            row = self.connection.execute(
+                'SELECT duration, sample_rate, channels, frames, codec FROM media'
+                ' WHERE path = ? AND size = ? AND mtime_ns = ? AND inode = ?',
+                (path, size, mtime_ns, inode),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            # access times are written in one go when the cache is closed
+            self._accessed[path] = time.time()
+        return MediaInfo(*row)
+
+    def set(self, audio_file: Path, info: MediaInfo) -> None:
+        try:
+            key = get_cache_key(audio_file)
+        except OSError:
+            return
+
+        with self._lock:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO media VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (*key, info.duration, info.sample_rate, info.channels, info.frames, info.codec, time.time()),
+            )
+
+    def evict(self) -> int:
+        """Removes the least recently used entries exceeding "max_entries" and returns their number."""
+        with self._lock:
+            cursor = self.connection.execute(
+                'DELETE FROM media WHERE path IN (SELECT path FROM media ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+                (self.max_entries,),
+            )
+        return cursor.rowcount
+
+    def prune(self) -> int:
+        """Removes entries of files which were deleted or modified and returns their number."""
+        stale_paths = []
+        for path, size, mtime_ns, inode in self.connection.execute('SELECT path, size, mtime_ns, inode FROM media'):
+            try:
+                key = get_cache_key(Path(path))
+            except OSError:
+                stale_paths.append((path,))
+                continue
+            if key != (path, size, mtime_ns, inode):
+                stale_paths.append((path,))
+
+        with self._lock:
+            self.connection.executemany('DELETE FROM media WHERE path = ?', stale_paths)
+        return len(stale_paths)
+
+    def clear(self) -> int:
+        with self._lock:
+            cursor = self.connection.execute('DELETE FROM media')
+            self.connection.execute('DELETE FROM counter')
+        return cursor.rowcount
+
+    def stats(self) -> dict[str, int]:
+        """Returns the number of entries and the hits/misses counters, including the ones not yet flushed."""
+        counters = dict(self.connection.execute('SELECT name, value FROM counter').fetchall())
+        (entries,) = self.connection.execute('SELECT count(*) FROM media').fetchone()
+        return {
+            'entries': entries,
+            'hits': counters.get('hits', 0) + self.hits,
+            'misses': counters.get('misses', 0) + self.misses,
+        }
+
+    def flush(self) -> None:
+        if not self.hits and not self.misses:
+            return
+
+        with self._lock:
+            connection = self.connection
+            connection.execute('BEGIN')
+            connection.executemany(
+                'UPDATE media SET accessed_at = ? WHERE path = ?',
+                [(accessed_at, path) for path, accessed_at in self._accessed.items()],
+            )
+            connection.executemany(
+                'INSERT INTO counter VALUES (?, ?) ON CONFLICT (name) DO UPDATE SET value = value + excluded.value',
+                [('hits', self.hits), ('misses', self.misses)],
+            )
+            connection.execute('COMMIT')
+            self.hits = self.misses = 0
+            self._accessed.clear()
+
+    def close(self) -> None:
+        if self._connection is None:
+            return
+
+        self.flush()
+        self.evict()
+        self._connection.close()
+        self._connection = None
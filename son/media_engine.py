@@ -0,0 +1,137 @@
+import asyncio
+import contextlib
+import os
+from collections.abc import AsyncIterator, Callable, Sequence
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from son.media import (
+    ConversionError,
+    MediaInfo,
+    get_ffprobe_command,
+    get_wav_conversion_command,
+    parse_ffprobe_output,
+    read_wav_info,
+)
+
+if TYPE_CHECKING:
+    from son.media_cache import MediaCache
+
+ProgressCallback = Callable[[float], None]
+
+
+class ProbeError(Exception):
+    def __init__(self, audio_file: Path, output: str):
+        super().__init__(f'unable to probe {audio_file}')
+        self.audio_file = audio_file
+        self.output = output
+
+
+class MediaEngine:
+    """
+    Runs ffmpeg and ffprobe processes from an event loop.
+
+    At most "max_processes" children run at the same time, the other calls wait for a free slot. Processes running
+    more than "timeout" seconds, the wait for a slot excluded, raise TimeoutError. A cancelled or timed out call kills
+    its process, so no child outlives the coroutine which started it.
+    """
+
+    def __init__(self, max_processes: int | None = None, timeout: float | None = None):
+        self.max_processes = max_processes or os.cpu_count() or 1
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(self.max_processes)
+
+    @contextlib.asynccontextmanager
+    async def _spawn(self, command: Sequence[str | Path], **kwargs) -> AsyncIterator[asyncio.subprocess.Process]:
+        async with self._semaphore:
+            process = await asyncio.create_subprocess_exec(*command, stdin=asyncio.subprocess.DEVNULL, **kwargs)
+            try:
+                yield process
+            finally:
+                if process.returncode is None:
+                    process.kill()
+                    # waiting for the process only ends when its pipes are closed, so unread output is read to its end,
+                    # and it is shielded, so the process is reaped even when the coroutine is cancelled again
+                    await asyncio.shield(process.communicate())
+
+    async def run(self, command: Sequence[str | Path]) -> tuple[int, str, str]:
+        """Runs "command" and returns its exit code, its standard output and its error output."""
+        async with (
+            self._spawn(command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE) as process,
+            asyncio.timeout(self.timeout),
+        ):
+            output, errors = await process.communicate()
+        return process.returncode, output.decode(errors='replace'), errors.decode(errors='replace')
+
+    async def probe(self, audio_file: Path, cache: 'MediaCache | None' = None) -> MediaInfo:
+        if cache is not None and (info := cache.get(audio_file)) is not None:
+            return info
+
+        info = read_wav_info(audio_file)
+        if info is None:
+            try:
+                _, output, errors = await self.run(get_ffprobe_command(audio_file))
+            except FileNotFoundError:
+                raise ProbeError(audio_file, 'ffprobe is not installed') from None
+            # ffprobe logs problems like damaged frames on stderr, they must not be mixed with the json output
+            try:
+                info = parse_ffprobe_output(output)
+            except ValueError:
+                raise ProbeError(audio_file, errors or output) from None
+        if cache is not None:
+            cache.set(audio_file, info)
+        return info
+
+    async def convert(self, audio_file: Path, output_path: Path, on_progress: ProgressCallback | None = None) -> None:
+        """
+        Converts "audio_file" in wav format, calling "on_progress" with the number of seconds converted so far.
+        """
+        ffmpeg, *arguments = get_wav_conversion_command(audio_file, output_path)
+        # ffmpeg writes "key=value" lines on stdout, a block of them ends with a "progress" key
+        command = [ffmpeg, '-nostats', '-progress', 'pipe:1', *arguments]
+        try:
+            async with (
+                self._spawn(command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE) as process,
+                asyncio.timeout(self.timeout),
+            ):
+                # stderr is read concurrently, otherwise ffmpeg blocks when the pipe buffer is full
+                errors = asyncio.ensure_future(process.stderr.read())
+                try:
+                    async for line in process.stdout:
+                        key, _, value = line.decode().strip().partition('=')
+                        if on_progress is not None and key == 'out_time_us' and value.isdigit():
+                            on_progress(int(value) / 1_000_000)
+                    await process.wait()
+                    output = (await errors).decode(errors='replace')
+                finally:
+                    errors.cancel()
+        except FileNotFoundError:
+            raise ConversionError(audio_file, 'ffmpeg is not installed') from None
+
+        if process.returncode != 0:
+            raise ConversionError(audio_file, output)
+
+    async def decode(self, audio_file: Path, chunk_size: int = 64 * 1024, loop: bool = False) -> AsyncIterator[bytes]:
+        """
+        Yields the audio of "audio_file" decoded in wav format, without writing it on the disk. With "loop", the file
+        is decoded again and again until the iteration is stopped.
+
+        The timeout does not apply, decoding is paced by the consumer of the chunks.
+        """
+        loop_options = ['-stream_loop', '-1'] if loop else []
+        command = ['ffmpeg', '-v', 'error', *loop_options, '-i', audio_file, '-f', 'wav', '-']
+        try:
+            async with self._spawn(command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE) as process:
+                errors = asyncio.ensure_future(process.stderr.read())
+                try:
+                    while chunk := await process.stdout.read(chunk_size):
+                        yield chunk
+                    await process.wait()
+                    output = (await errors).decode(errors='replace')
+                finally:
+                    errors.cancel()
+        except FileNotFoundError:
+            raise ConversionError(audio_file, 'ffmpeg is not installed') from None
+
+        if process.returncode != 0:
+            raise ConversionError(audio_file, output)
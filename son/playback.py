@@ -0,0 +1,306 @@
+# ruff: noqa: S607
+import contextlib
+import io
+import os
+import platform
+import shutil
+import subprocess
+import threading
+import time
+import wave
+from collections import deque
+from collections.abc import Callable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Protocol
+
+import nava
+
+from son.clock import sleep_until
+from son.media import read_wav_info
+
+if TYPE_CHECKING:
+    import asyncio
+
+
+class AudioSink(Protocol):
+    def play(self, path: str) -> int: ...
+
+    def stop(self, sound_id: int) -> None: ...
+
+
+class NavaSink:
+    def play(self, path: str) -> int:
+        return nava.play(path, async_mode=True)
+
+    def stop(self, sound_id: int) -> None:
+        nava.stop(sound_id)
+
+
+# slots keep the snapshot of large playlists compact
+@dataclass(frozen=True, slots=True)
+class Track:
+    path: str
+    duration: float
+
+
+def prefetch_track(track: Track) -> Track | None:
+    """
+    Asks the OS to load the track in its page cache and returns the track with its exact duration, or None if the
+    track file cannot be opened.
+    """
+    path = Path(track.path)
+    try:
+        with path.open('rb') as f:
+            if hasattr(os, 'posix_fadvise'):
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
+            else:
+                while f.read(1024 * 1024):
+                    pass
+    except OSError:
+        return None
+
+    # durations stored in the database are rounded down to the second, which is not precise enough to chain tracks
+    info = read_wav_info(path)
+    return track if info is None else Track(track.path, info.duration)
+
+
+# called with the track, its position (starting at 1), the number of tracks and the monotonic time at which
+# the track ends, it should return at this time at the latest
+TrackCallback = Callable[[Track, int, int, float], None]
+# called with a track whose file cannot be opened, the track is skipped
+MissingTrackCallback = Callable[[Track], None]
+
+
+class PlaylistPlayer:
+    """
+    Plays tracks one after the other, with "gap" seconds of silence between them.
+
+    The next track is prefetched while the current one is playing and each track is started on a deadline computed
+    from the monotonic clock, so that there is no drift between tracks. Prefetching also checks that the track file
+    exists, so missing tracks are skipped when their turn comes instead of being checked before playing.
+    """
+
+    def __init__(
+        self,
+        sink: AudioSink,
+        gap: float = 0,
+        on_track: TrackCallback | None = None,
+        on_missing_track: MissingTrackCallback | None = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.sink = sink
+        self.gap = gap
+        self.on_track = on_track
+        self.on_missing_track = on_missing_track
+        self.clock = clock
+        self.sleep = sleep
+
+    def play(self, tracks: Sequence[Track]) -> int:
+        """Returns the number of tracks played, missing tracks excepted."""
+        if not tracks:
+            return 0
+
+        count = len(tracks)
+        played = 0
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            next_track = executor.submit(prefetch_track, tracks[0])
+            start = self.clock()
+            for index in range(count):
+                track = next_track.result()
+                if index + 1 < count:
+                    next_track = executor.submit(prefetch_track, tracks[index + 1])
+                if track is None:
+                    if self.on_missing_track is not None:
+                        self.on_missing_track(tracks[index])
+                    continue
+
+                sleep_until(start, self.clock, self.sleep)
+                sound_id = self.sink.play(track.path)
+                deadline = self.clock() + track.duration
+                if self.on_track is not None:
+                    self.on_track(track, index + 1, count, deadline)
+                sleep_until(deadline, self.clock, self.sleep)
+                self.sink.stop(sound_id)
+                start = deadline + self.gap
+                played += 1
+        return played
+
+
+def decode_wav(path: str) -> bytes | None:
+    """
+    Decodes a wav file and returns a plain PCM wav holding only its samples, or None if the wave module does not
+    know how to decode it (float samples for example).
+    """
+    try:
+        with wave.open(path, 'rb') as reader:
+            params = reader.getparams()
+            frames = reader.readframes(params.nframes)
+    except (wave.Error, EOFError):
+        return None
+
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as writer:
+        writer.setparams(params)
+        writer.writeframes(frames)
+    return buffer.getvalue()
+
+
+# seconds a sound may take to play beyond its length, starting the player and opening the audio device included
+SOUND_LATENCY_BUDGET = 0.5
+# plays a sound synchronously, given its path and its decoded data if any
+SoundPlayer = Callable[[str, bytes | None], None]
+# called with the path of a sound and its latency in seconds, when the latency exceeds the budget
+SlowSoundCallback = Callable[[str, float], None]
+
+
+def play_sound(path: str, data: bytes | None) -> None:
+    """Plays a sound synchronously, from its decoded data when the player of the platform can read it from memory."""
+    system = platform.system()
+    if data is not None and system == 'Windows':
+        import winsound
+
+        winsound.PlaySound(data, winsound.SND_MEMORY)
+    elif data is not None and system == 'Linux' and shutil.which('aplay'):
+        subprocess.run(
+            ['aplay', '--quiet', '-'], input=data, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False
+        )
+    else:
+        # other players like afplay can only read files, as well as sounds the wave module cannot decode
+        nava.play(path)
+
+
+@dataclass(frozen=True)
+class Sound:
+    data: bytes | None
+    # None if the file is not a wav file, the latency of the sound cannot be measured then
+    duration: float | None
+
+
+class SoundPool:
+    """
+    Keeps short wav sounds decoded in memory, so that they can be played many times without reading the disk.
+
+    Sounds are played synchronously, so the latency of a play is the time it takes beyond the length of the sound. It
+    is measured for the last plays, "max_latency" gives the worst one, and "on_slow_sound" is called each time it
+    exceeds "latency_budget".
+    """
+
+    def __init__(
+        self,
+        latency_budget: float = SOUND_LATENCY_BUDGET,
+        on_slow_sound: SlowSoundCallback | None = None,
+        latency_samples: int = 32,
+        player: SoundPlayer = play_sound,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.latency_budget = latency_budget
+        self.on_slow_sound = on_slow_sound
+        self.player = player
+        self.clock = clock
+        self._sounds: dict[str, Sound] = {}
+        self._latencies: deque[float] = deque(maxlen=latency_samples)
+
+    @property
+    def max_latency(self) -> float:
+        return max(self._latencies, default=0)
+
+    def load(self, path: str) -> None:
+        if path not in self._sounds:
+            info = read_wav_info(Path(path))
+            self._sounds[path] = Sound(decode_wav(path), None if info is None else info.duration)
+
+    def play(self, path: str) -> None:
+        self.load(path)
+        sound = self._sounds[path]
+        start = self.clock()
+        self.player(path, sound.data)
+        if sound.duration is None:
+            return
+
+        latency = max(self.clock() - start - sound.duration, 0)
+        self._latencies.append(latency)
+        if latency > self.latency_budget and self.on_slow_sound is not None:
+            self.on_slow_sound(path, latency)
+
+
+def can_stream() -> bool:
+    """
+    Tells if files can be decoded and played on the fly, aplay is the only player known to read from stdin. ffprobe
+    is needed too, it gives the duration of the file.
+    """
+    return platform.system() == 'Linux' and all(shutil.which(program) for program in ('aplay', 'ffmpeg', 'ffprobe'))
+
+
+class TranscodingStream:
+    """
+    Decodes an audio file with ffmpeg and plays its PCM output with aplay, without writing anything on the disk.
+
+    Both processes are driven by an event loop running in a background thread. Each decoded chunk is written to aplay
+    and the decoding waits until aplay has read it, so ffmpeg is paused when it decodes faster than the sound is played
+    and memory usage does not depend on the length of the file.
+    """
+
+    chunk_size = 64 * 1024
+
+    def __init__(self, audio_file: Path, loop: bool = False):
+        self.audio_file = audio_file
+        self.loop = loop
+        self._event_loop: asyncio.AbstractEventLoop | None = None
+        self._task: asyncio.Task | None = None
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        import asyncio
+
+        self._event_loop = asyncio.new_event_loop()
+        self._task = self._event_loop.create_task(self._stream())
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        import asyncio
+
+        with contextlib.suppress(asyncio.CancelledError):
+            self._event_loop.run_until_complete(self._task)
+
+    async def _stream(self) -> None:
+        import asyncio
+
+        from son.media import ConversionError
+        from son.media_engine import MediaEngine
+
+        player = await asyncio.create_subprocess_exec(
+            'aplay',
+            '--quiet',
+            '-',
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        # when the stream is cancelled, the decoder is closed right away, so ffmpeg is killed before the event loop ends
+        decoder = contextlib.aclosing(MediaEngine().decode(self.audio_file, self.chunk_size, self.loop))
+        try:
+            async with decoder as chunks:
+                async for chunk in chunks:
+                    player.stdin.write(chunk)
+                    await player.stdin.drain()
+            player.stdin.close()
+            await player.wait()
+        except (ConnectionError, ConversionError):
+            # the player exited or the file could not be decoded, the sound stops like when it is played to its end
+            pass
+        finally:
+            if player.returncode is None:
+                player.kill()
+                await asyncio.shield(player.wait())
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        # cancelling the stream kills ffmpeg and aplay, it does nothing if the sound was played to its end
+        self._event_loop.call_soon_threadsafe(self._task.cancel)
+        self._thread.join()
+        self._event_loop.close()
@@ -0,0 +1,101 @@
+import os
+import threading
+from collections.abc import Collection, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# (st_dev, st_ino) of a file or directory, it is the same whatever the path or symlink used to reach it
+FileId = tuple[int, int]
+# a directory to walk and its device
+Directory = tuple[str, int]
+
+
+class _Walker:
+    def __init__(self, extensions: Collection[str]):
+        self.extensions = tuple(extension.lower() for extension in extensions)
+        self._visited: set[FileId] = set()
+        self._lock = threading.Lock()
+
+    def visit(self, stat: os.stat_result) -> bool:
+        """Returns False if the directory was already visited, which happens with symlink loops."""
+        file_id = (stat.st_dev, stat.st_ino)
+        with self._lock:
+            if file_id in self._visited:
+                return False
+            self._visited.add(file_id)
+            return True
+
+    def scan(self, directory: Directory) -> tuple[list[tuple[FileId, str]], list[Directory]]:
+        """Returns matching files of "directory" and its subdirectories not visited yet."""
+        path, device = directory
+        files = []
+        subdirectories = []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir():
+                            # DirEntry.stat() gives a null inode and device on Windows, os.stat gives the real ones
+                            stat = os.stat(entry.path)
+                            if self.visit(stat):
+                                subdirectories.append((entry.path, stat.st_dev))
+                        elif entry.name.lower().endswith(self.extensions) and entry.is_file():
+                            files.append((self._get_file_id(entry, device), entry.path))
+                    except OSError:
+                        # broken symlink or file removed during the walk
+                        continue
+        except OSError:
+            # directory not readable or removed during the walk
+            pass
+        return files, subdirectories
+
+    def walk(self, directory: Directory) -> list[tuple[FileId, str]]:
+        files = []
+        stack = [directory]
+        while stack:
+            directory_files, subdirectories = self.scan(stack.pop())
+            files.extend(directory_files)
+            stack.extend(subdirectories)
+        return files
+
+    @staticmethod
+    def _get_file_id(entry: os.DirEntry, device: int) -> FileId:
+        # the inode of a regular file is given by scandir, a stat call is only needed for symlinks
+        if entry.is_symlink():
+            stat = os.stat(entry.path)
+            return stat.st_dev, stat.st_ino
+        return device, entry.inode()
+
+
+def scan_audio_files(folders: Iterable[Path], extensions: Collection[str], workers: int | None = None) -> list[Path]:
+    """
+    Returns files of "folders" and their subfolders whose extension is one of "extensions", sorted by path.
+
+    Extensions are matched case-insensitively and symlinks are followed. A file reachable through several paths (hard
+    links, symlinks, nested folders) is returned once, and each directory is walked once, so symlink loops are not a
+    problem. Top-level subfolders are walked in parallel by "workers" threads.
+    """
+    walker = _Walker(extensions)
+    files: list[tuple[FileId, str]] = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = []
+        for folder in folders:
+            try:
+                stat = folder.stat()
+            except OSError:
+                continue
+            if not walker.visit(stat):
+                continue
+            folder_files, subdirectories = walker.scan((str(folder), stat.st_dev))
+            files.extend(folder_files)
+            futures.extend(executor.submit(walker.walk, subdirectory) for subdirectory in subdirectories)
+        for future in futures:
+            files.extend(future.result())
+
+    seen: set[FileId] = set()
+    paths = []
+    for file_id, path in sorted(files, key=lambda file: file[1]):
+        if file_id not in seen:
+            seen.add(file_id)
+            paths.append(Path(path))
+    return paths
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 from pydantic import Field, FilePath
@@ -16,3 +17,12 @@ class Settings(BaseSettings):
     pomo_short_break_time: int = Field(default=5 * 60, description='Short break time in seconds')
     pomo_long_break_time: int = Field(default=15 * 60, description='Long break time in seconds')
     pomo_long_break_interval: int = Field(default=4, description='Number of work sessions before a long break')
+    refresh_rate: float = Field(default=1, gt=0, description='Number of progress bar refreshes per second')
+    playlist_gap: float = Field(default=1, ge=0, description='Silence in seconds between two playlist songs')
+    import_workers: int = Field(
+        default_factory=lambda: os.cpu_count() or 1, ge=1, description='Number of songs probed in parallel on import'
+    )
+    media_cache_size: int = Field(default=50_000, ge=0, description='Maximum number of entries in the media cache')
+    conversion_cache_size: int = Field(
+        default=1024, ge=0, description='Maximum size in megabytes of the directory storing converted files'
+    )
@@ -0,0 +1,84 @@
+import os
+import subprocess
+import sys
+import wave
+from pathlib import Path
+
+import pytest
+from sqlalchemy import func, select
+
+import son
+from son.database import Playlist, PlaylistTrack, Track
+from son.main import Container
+
+PROCESS_COUNT = 4
+SONGS_PER_PROCESS = 25
+SON = 'import sys; sys.argv[0] = "son"; from son.main import cli; cli()'
+
+
+def create_songs(folder: Path, count: int) -> None:
+    folder.mkdir(parents=True)
+    for index in range(count):
+        with wave.open(str(folder / f'song-{index}.wav'), 'wb') as file:
+            file.setnchannels(1)
+            file.setsampwidth(2)
+            file.setframerate(8000)
+            file.writeframes(bytes(2 * 8000 * (index + 1)))
+
+
+def start_son(*args: str, environment: dict[str, str]) -> subprocess.Popen:
+    return subprocess.Popen(  # noqa: S603
+        [sys.executable, '-c', SON, *args], env=environment, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True
+    )
+
+
+def run_son(*args: str, environment: dict[str, str]) -> str:
+    process = start_son(*args, environment=environment)
+    output, _ = process.communicate()
+    assert process.returncode == 0, output
+    return output
+
+
+def test_concurrent_processes_add_and_remove_songs(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv('XDG_DATA_HOME', str(tmp_path / 'data'))
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    environment = {**os.environ, 'PYTHONPATH': str(Path(son.__file__).parents[1])}
+    music = tmp_path.resolve() / 'music'
+    for index in range(PROCESS_COUNT):
+        create_songs(music / 'old' / str(index), SONGS_PER_PROCESS)
+        create_songs(music / 'new' / str(index), SONGS_PER_PROCESS)
+    run_son('playlist', 'create', 'shared', '-f', str(music / 'old'), environment=environment)
+
+    # each process adds a folder of new songs or removes a folder of old songs, all at the same time
+    processes = []
+    for index in range(PROCESS_COUNT):
+        processes.append(
+            start_son('playlist', 'add-songs', 'shared', '-f', str(music / 'new' / str(index)), environment=environment)
+        )
+        processes.append(
+            start_son('playlist', 'rm-songs', 'shared', '-m', f'{music}/old/{index}/*', environment=environment)
+        )
+    outputs = [process.communicate()[0] for process in processes]
+
+    for process, output in zip(processes, outputs, strict=True):
+        assert 'database is locked' not in output
+        assert process.returncode == 0, output
+
+    expected_paths = {
+        str(music / 'new' / str(index) / f'song-{song}.wav')
+        for index in range(PROCESS_COUNT)
+        for song in range(SONGS_PER_PROCESS)
+    }
+    with Container().db.Session() as session:
+        playlist = session.execute(select(Playlist).where(Playlist.name == 'shared')).scalar_one()
+        statement = select(Track.path).join(PlaylistTrack.track).where(PlaylistTrack.playlist_id == playlist.id)
+        paths = list(session.execute(statement).scalars())
+        # old songs stay in the library, only their playlist rows are removed
+        track_count = session.execute(select(func.count()).select_from(Track)).scalar_one()
+
+    assert len(paths) == len(expected_paths)
+    assert set(paths) == expected_paths
+    assert track_count == 2 * PROCESS_COUNT * SONGS_PER_PROCESS
+    # aggregates are kept up to date by triggers, whatever the order in which processes committed
+    assert playlist.song_count == len(expected_paths)
+    assert playlist.total_duration == PROCESS_COUNT * sum(range(1, SONGS_PER_PROCESS + 1))
@@ -0,0 +1,84 @@
+import struct
+import wave
+from pathlib import Path
+
+import pytest
+
+from son.media import probe_media_info, read_wav_info
+
+FFPROBE_OUTPUT = (
+    '{"streams": [{"codec_name": "mp3", "sample_rate": "44100", "channels": 2}], "format": {"duration": "2.5"}}'
+)
+
+
+def write_wav(path: Path, frames: int, sample_rate: int = 8000, channels: int = 1) -> Path:
+    with wave.open(str(path), 'wb') as file:
+        file.setnchannels(channels)
+        file.setsampwidth(2)
+        file.setframerate(sample_rate)
+        file.writeframes(b'\x00\x00' * channels * frames)
+    return path
+
+
+def write_riff(path: Path, *chunks: tuple[bytes, bytes]) -> Path:
+    body = b'WAVE' + b''.join(
+        # odd sized chunks are followed by a padding byte
+        chunk_id + struct.pack('<I', len(data)) + data + b'\x00' * (len(data) & 1)
+        for chunk_id, data in chunks
+    )
+    path.write_bytes(b'RIFF' + struct.pack('<I', len(body)) + body)
+    return path
+
+
+def fake_ffprobe(directory: Path, monkeypatch: pytest.MonkeyPatch, stdout: str, stderr: str) -> None:
+    directory.mkdir()
+    (directory / 'stdout.txt').write_text(stdout)
+    (directory / 'stderr.txt').write_text(stderr)
+    script = directory / 'ffprobe'
+    script.write_text(f'#!/bin/sh\ncat "{directory}/stdout.txt"\ncat "{directory}/stderr.txt" >&2\n')
+    script.chmod(0o755)
+    monkeypatch.setenv('PATH', f'{directory}:/usr/bin:/bin')
+
+
+def test_read_wav_info_computes_the_exact_duration(tmp_path: Path):
+    info = read_wav_info(write_wav(tmp_path / 'song.wav', frames=12000, channels=2))
+
+    assert info is not None
+    assert info.duration == 1.5
+    assert (info.sample_rate, info.channels, info.frames, info.codec) == (8000, 2, 12000, 'pcm_s16le')
+
+
+def test_read_wav_info_handles_extensible_format_and_odd_chunk_layouts(tmp_path: Path):
+    # WAVE_FORMAT_EXTENSIBLE header whose sub-format GUID starts with WAVE_FORMAT_IEEE_FLOAT
+    fmt = struct.pack('<HHIIHHHHIH14s', 0xFFFE, 1, 8000, 32000, 4, 32, 22, 32, 4, 0x0003, bytes(14))
+    path = write_riff(tmp_path / 'song.wav', (b'LIST', b'odd'), (b'data', bytes(4 * 4000)), (b'fmt ', fmt))
+
+    info = read_wav_info(path)
+
+    assert info is not None
+    assert info.duration == 0.5
+    assert info.codec == 'pcm_f32le'
+
+
+def test_read_wav_info_returns_none_for_other_formats(tmp_path: Path):
+    path = tmp_path / 'song.mp3'
+    path.write_bytes(b'ID3' + bytes(100))
+
+    assert read_wav_info(path) is None
+
+
+def test_probe_media_info_ignores_ffprobe_logs(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    fake_ffprobe(tmp_path / 'bin', monkeypatch, FFPROBE_OUTPUT, '[mp3 @ 0x5581] Header missing\n')
+
+    info = probe_media_info(tmp_path / 'song.mp3')
+
+    assert (info.duration, info.sample_rate, info.channels, info.codec) == (2.5, 44100, 2, 'mp3')
+
+
+def test_probe_media_info_reports_ffprobe_errors(tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys):
+    fake_ffprobe(tmp_path / 'bin', monkeypatch, '{}', 'song.mp3: Invalid data found when processing input\n')
+
+    with pytest.raises(SystemExit):
+        probe_media_info(tmp_path / 'song.mp3')
+
+    assert 'Invalid data found' in capsys.readouterr().err
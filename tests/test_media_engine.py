@@ -0,0 +1,129 @@
+import asyncio
+import time
+import wave
+from pathlib import Path
+
+import pytest
+
+from son.media import ConversionError
+from son.media_engine import MediaEngine, ProbeError
+from son.playback import TranscodingStream
+
+FFPROBE_OUTPUT = (
+    '{"streams": [{"codec_name": "mp3", "sample_rate": "44100", "channels": 2}], "format": {"duration": "2.5"}}'
+)
+
+
+def install_script(directory: Path, monkeypatch: pytest.MonkeyPatch, name: str, content: str) -> None:
+    directory.mkdir(exist_ok=True)
+    script = directory / name
+    script.write_text(f'#!/bin/sh\n{content}')
+    script.chmod(0o755)
+    monkeypatch.setenv('PATH', f'{directory}:/usr/bin:/bin')
+
+
+def test_probe_reads_wav_files_without_ffprobe(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv('PATH', str(tmp_path))
+    with wave.open(str(tmp_path / 'song.wav'), 'wb') as file:
+        file.setnchannels(1)
+        file.setsampwidth(2)
+        file.setframerate(8000)
+        file.writeframes(bytes(2 * 12000))
+
+    info = asyncio.run(MediaEngine().probe(tmp_path / 'song.wav'))
+
+    assert info.duration == 1.5
+
+
+def test_probe_ignores_ffprobe_logs(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    install_script(tmp_path / 'bin', monkeypatch, 'ffprobe', f"echo '{FFPROBE_OUTPUT}'\necho 'Header missing' >&2\n")
+
+    info = asyncio.run(MediaEngine().probe(tmp_path / 'song.mp3'))
+
+    assert (info.duration, info.sample_rate, info.channels, info.codec) == (2.5, 44100, 2, 'mp3')
+
+
+def test_probe_reports_ffprobe_errors(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    install_script(tmp_path / 'bin', monkeypatch, 'ffprobe', "echo '{}'\necho 'Invalid data found' >&2\n")
+
+    with pytest.raises(ProbeError) as exc_info:
+        asyncio.run(MediaEngine().probe(tmp_path / 'song.mp3'))
+
+    assert exc_info.value.output == 'Invalid data found\n'
+
+
+def test_probes_run_at_most_max_processes_at_a_time(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    install_script(tmp_path / 'bin', monkeypatch, 'ffprobe', f"sleep 0.2\necho '{FFPROBE_OUTPUT}'\n")
+    engine = MediaEngine(max_processes=2)
+
+    async def probe_all() -> None:
+        await asyncio.gather(*(engine.probe(tmp_path / f'song-{index}.mp3') for index in range(4)))
+
+    start = time.monotonic()
+    asyncio.run(probe_all())
+
+    # two rounds of two processes
+    assert 0.4 <= time.monotonic() - start < 0.8
+
+
+def test_decode_yields_the_ffmpeg_output(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    (tmp_path / 'decoded.wav').write_bytes(b'RIFF' + bytes(100_000))
+    install_script(tmp_path / 'bin', monkeypatch, 'ffmpeg', f'cat "{tmp_path}/decoded.wav"\n')
+
+    async def decode() -> bytes:
+        return b''.join([chunk async for chunk in MediaEngine().decode(tmp_path / 'song.mp3', chunk_size=4096)])
+
+    assert asyncio.run(decode()) == (tmp_path / 'decoded.wav').read_bytes()
+
+
+def test_decode_reports_ffmpeg_errors(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    install_script(tmp_path / 'bin', monkeypatch, 'ffmpeg', "echo 'Invalid data found' >&2\nexit 1\n")
+
+    async def decode() -> None:
+        async for _ in MediaEngine().decode(tmp_path / 'song.mp3'):
+            pass
+
+    with pytest.raises(ConversionError) as exc_info:
+        asyncio.run(decode())
+
+    assert exc_info.value.output == 'Invalid data found\n'
+
+
+def test_transcoding_stream_plays_the_decoded_audio(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    (tmp_path / 'decoded.wav').write_bytes(b'RIFF' + bytes(1_000_000))
+    install_script(tmp_path / 'bin', monkeypatch, 'ffmpeg', f'cat "{tmp_path}/decoded.wav"\n')
+    install_script(
+        tmp_path / 'bin',
+        monkeypatch,
+        'aplay',
+        f'cat > "{tmp_path}/played.part"\nmv "{tmp_path}/played.part" "{tmp_path}/played.wav"\n',
+    )
+    stream = TranscodingStream(tmp_path / 'song.mp3')
+
+    stream.start()
+    deadline = time.monotonic() + 5
+    while not (tmp_path / 'played.wav').exists() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    stream.stop()
+
+    assert (tmp_path / 'played.wav').read_bytes() == (tmp_path / 'decoded.wav').read_bytes()
+
+
+def test_stopping_a_transcoding_stream_kills_its_processes(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    install_script(tmp_path / 'bin', monkeypatch, 'ffmpeg', f'echo $$ > "{tmp_path}/ffmpeg.pid"\nexec cat /dev/zero\n')
+    install_script(tmp_path / 'bin', monkeypatch, 'aplay', f'echo $$ > "{tmp_path}/aplay.pid"\nexec sleep 60\n')
+    stream = TranscodingStream(tmp_path / 'song.mp3', loop=True)
+
+    stream.start()
+    deadline = time.monotonic() + 5
+    while (
+        not all((tmp_path / f'{program}.pid').exists() for program in ('ffmpeg', 'aplay'))
+        and time.monotonic() < deadline
+    ):
+        time.sleep(0.01)
+    start = time.monotonic()
+    stream.stop()
+
+    assert time.monotonic() - start < 1
+    for program in ('ffmpeg', 'aplay'):
+        assert not Path(f'/proc/{(tmp_path / f"{program}.pid").read_text().strip()}').exists()
@@ -0,0 +1,202 @@
+import wave
+from pathlib import Path
+
+import pytest
+
+from son.playback import PlaylistPlayer, SoundPool, Track
+
+SAMPLE_RATE = 8000
+
+
+class FakeClock:
+    """A monotonic clock which only moves forward when sleeping."""
+
+    def __init__(self, now: float = 100):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+
+class RecordingSink:
+    """An audio sink recording when each sound is started and stopped."""
+
+    def __init__(self, clock: FakeClock):
+        self.clock = clock
+        self.events: list[tuple[str, str, float]] = []
+        self.paths: list[str] = []
+
+    def play(self, path: str) -> int:
+        self.events.append(('play', Path(path).name, self.clock()))
+        self.paths.append(path)
+        return len(self.paths) - 1
+
+    def stop(self, sound_id: int) -> None:
+        self.events.append(('stop', Path(self.paths[sound_id]).name, self.clock()))
+
+
+class FakePlayer:
+    """A sound player taking the length of the sound plus a delay to play it."""
+
+    def __init__(self, clock: FakeClock, length: float):
+        self.clock = clock
+        self.length = length
+        self.delays: list[float] = []
+        self.plays: list[tuple[str, bytes | None]] = []
+
+    def __call__(self, path: str, data: bytes | None) -> None:
+        self.plays.append((path, data))
+        self.clock.sleep(self.length + (self.delays.pop(0) if self.delays else 0))
+
+
+def create_track(path: Path, duration: float) -> Track:
+    with wave.open(str(path), 'wb') as file:
+        file.setnchannels(1)
+        file.setsampwidth(2)
+        file.setframerate(SAMPLE_RATE)
+        file.writeframes(bytes(2 * int(SAMPLE_RATE * duration)))
+    # durations stored in the database are rounded down, the player reads the exact one in the file
+    return Track(str(path), int(duration))
+
+
+@pytest.fixture()
+def clock() -> FakeClock:
+    return FakeClock()
+
+
+@pytest.fixture()
+def sink(clock: FakeClock) -> RecordingSink:
+    return RecordingSink(clock)
+
+
+@pytest.mark.parametrize(
+    ('gap', 'expected_events'),
+    [
+        (0, [('play', 'a.wav', 100), ('stop', 'a.wav', 102), ('play', 'b.wav', 102), ('stop', 'b.wav', 103.5)]),
+        (0.5, [('play', 'a.wav', 100), ('stop', 'a.wav', 102), ('play', 'b.wav', 102.5), ('stop', 'b.wav', 104)]),
+    ],
+)
+def test_tracks_are_handed_off_on_deadlines(
+    tmp_path: Path, clock: FakeClock, sink: RecordingSink, gap: float, expected_events: list
+):
+    tracks = [create_track(tmp_path / 'a.wav', 2), create_track(tmp_path / 'b.wav', 1.5)]
+    player = PlaylistPlayer(sink, gap, clock=clock, sleep=clock.sleep)
+
+    assert player.play(tracks) == 2
+    assert sink.events == expected_events
+
+
+def test_time_spent_showing_progress_does_not_delay_the_next_track(
+    tmp_path: Path, clock: FakeClock, sink: RecordingSink
+):
+    deadlines = []
+
+    def show_progress(track: Track, index: int, count: int, deadline: float) -> None:
+        deadlines.append((index, count, deadline))
+        # like the progress bar, it returns at the deadline, a little late
+        clock.now = deadline + 0.01
+
+    tracks = [create_track(tmp_path / 'a.wav', 2), create_track(tmp_path / 'b.wav', 1)]
+    player = PlaylistPlayer(sink, 0.5, on_track=show_progress, clock=clock, sleep=clock.sleep)
+
+    assert player.play(tracks) == 2
+    assert deadlines == [(1, 2, 102), (2, 2, 103.5)]
+    assert [event[:2] for event in sink.events] == [
+        ('play', 'a.wav'),
+        ('stop', 'a.wav'),
+        ('play', 'b.wav'),
+        ('stop', 'b.wav'),
+    ]
+    # the late callback delays stopping a track, but the next track still starts on its deadline
+    assert sink.events[2][2] == 102.5
+
+
+def test_missing_tracks_are_skipped_without_delay(tmp_path: Path, clock: FakeClock, sink: RecordingSink):
+    missing_tracks = []
+    tracks = [
+        create_track(tmp_path / 'a.wav', 2),
+        Track(str(tmp_path / 'missing.wav'), 60),
+        create_track(tmp_path / 'b.wav', 1),
+    ]
+    player = PlaylistPlayer(sink, 0.5, on_missing_track=missing_tracks.append, clock=clock, sleep=clock.sleep)
+
+    assert player.play(tracks) == 2
+    assert missing_tracks == [tracks[1]]
+    assert sink.events == [
+        ('play', 'a.wav', 100),
+        ('stop', 'a.wav', 102),
+        ('play', 'b.wav', 102.5),
+        ('stop', 'b.wav', 103.5),
+    ]
+
+
+def test_nothing_is_played_when_all_tracks_are_missing(tmp_path: Path, clock: FakeClock, sink: RecordingSink):
+    player = PlaylistPlayer(sink, clock=clock, sleep=clock.sleep)
+
+    assert player.play([Track(str(tmp_path / 'missing.wav'), 60)]) == 0
+    assert sink.events == []
+    assert clock.now == 100
+
+
+def test_sound_pool_plays_sounds_from_memory(tmp_path: Path, clock: FakeClock):
+    path = create_track(tmp_path / 'alarm.wav', 1).path
+    player = FakePlayer(clock, 1)
+    pool = SoundPool(player=player, clock=clock)
+    pool.load(path)
+    Path(path).unlink()
+
+    pool.play(path)
+    pool.play(path)
+
+    assert len(player.plays) == 2
+    data = player.plays[0][1]
+    assert data is not None
+    assert data.startswith(b'RIFF')
+    assert player.plays[1][1] is data
+    assert pool.max_latency == 0
+
+
+def test_sound_pool_reports_sounds_exceeding_the_latency_budget(tmp_path: Path, clock: FakeClock):
+    path = create_track(tmp_path / 'alarm.wav', 1).path
+    slow_sounds = []
+    player = FakePlayer(clock, 1)
+    player.delays = [0.2, 0.8, 0.1]
+    pool = SoundPool(
+        latency_budget=0.5, on_slow_sound=lambda *args: slow_sounds.append(args), player=player, clock=clock
+    )
+
+    for _ in range(3):
+        pool.play(path)
+
+    assert slow_sounds == [(path, pytest.approx(0.8))]
+    assert pool.max_latency == pytest.approx(0.8)
+
+
+def test_sound_pool_only_keeps_the_latency_of_the_last_plays(tmp_path: Path, clock: FakeClock):
+    path = create_track(tmp_path / 'alarm.wav', 1).path
+    player = FakePlayer(clock, 1)
+    player.delays = [0.8, 0.1, 0.2]
+    pool = SoundPool(latency_samples=2, player=player, clock=clock)
+
+    for _ in range(3):
+        pool.play(path)
+
+    assert pool.max_latency == pytest.approx(0.2)
+
+
+def test_sound_pool_plays_undecodable_sounds_from_their_file(tmp_path: Path, clock: FakeClock):
+    path = tmp_path / 'alarm.mp3'
+    path.write_bytes(b'ID3' + bytes(100))
+    player = FakePlayer(clock, 3)
+    slow_sounds = []
+    pool = SoundPool(on_slow_sound=lambda *args: slow_sounds.append(args), player=player, clock=clock)
+
+    pool.play(str(path))
+
+    assert player.plays == [(str(path), None)]
+    # the length of the sound is unknown, so its latency cannot be measured
+    assert pool.max_latency == 0
+    assert slow_sounds == []
@@ -0,0 +1,53 @@
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from son.commands.playlist.utils import add_playlist_tracks, upsert_tracks
+from son.database import Playlist
+from son.main import Container, cli
+
+
+@pytest.fixture()
+def data_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    monkeypatch.setenv('XDG_DATA_HOME', str(tmp_path))
+    return tmp_path / 'son'
+
+
+def create_playlist(name: str, song_count: int) -> None:
+    obj = Container()
+    with obj.db.begin() as session:
+        playlist = Playlist(name=name)
+        session.add(playlist)
+        session.flush()
+        songs = [(f'/music/{name}/song-{index}.wav', 60, 1000, index) for index in range(song_count)]
+        add_playlist_tracks(session, playlist.id, upsert_tracks(session, songs).values())
+
+
+def count_selects(args: list[str]) -> int:
+    """Runs the son command and returns the number of SELECT statements it executed."""
+    statements = []
+
+    def record(_connection, _cursor, statement, *_args) -> None:
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append(statement)
+
+    # the command creates its own engine, so all engines are listened to
+    event.listen(Engine, 'before_cursor_execute', record)
+    try:
+        result = CliRunner().invoke(cli, args)
+    finally:
+        event.remove(Engine, 'before_cursor_execute', record)
+    assert result.exit_code == 0, result.output
+    return len(statements)
+
+
+@pytest.mark.usefixtures('data_dir')
+@pytest.mark.parametrize('song_count', [1, 50])
+def test_describe_does_not_load_songs_one_by_one(song_count: int):
+    create_playlist('rock', song_count)
+
+    # one statement for the playlist and one for its songs, whatever the number of songs
+    assert count_selects(['playlist', 'describe', 'rock']) == 2
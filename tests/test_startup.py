@@ -0,0 +1,89 @@
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from son.main import cli
+
+# importing son.main takes about 60 ms when subcommands are loaded lazily, and about 760 ms otherwise
+IMPORT_TIME_BUDGET_US = 250_000
+HEAVY_MODULES = (
+    'sqlalchemy',
+    'alchemical',
+    'rapidfuzz',
+    'questionary',
+    'rich.table',
+    'rich.progress',
+    'asyncio',
+    'pydantic',
+    'nava',
+)
+PRINT_HEAVY_MODULES = f'print(*(m for m in {HEAVY_MODULES!r} if m in sys.modules), file=sys.stderr)'
+
+
+def run_python(code: str, *options: str, env: dict[str, str] | None = None) -> subprocess.CompletedProcess:
+    return subprocess.run(  # noqa: S603
+        [sys.executable, *options, '-c', code], capture_output=True, text=True, check=True, env=env
+    )
+
+
+def get_import_time(module: str) -> int:
+    """Returns the cumulative time in microseconds taken to import the module, as given by python -X importtime."""
+    result = run_python(f'import {module}', '-X', 'importtime')
+    # lines look like "import time:      1234 |       5678 | son.main"
+    match = re.search(rf'^import time:\s*\d+\s*\|\s*(\d+)\s*\|\s*{re.escape(module)}$', result.stderr, re.MULTILINE)
+    assert match is not None, result.stderr
+    return int(match.group(1))
+
+
+def test_import_time_is_within_budget():
+    # the fastest of a few runs, to not fail because of a busy machine
+    import_time = min(get_import_time('son.main') for _ in range(3))
+
+    assert import_time < IMPORT_TIME_BUDGET_US
+
+
+def test_heavy_modules_are_not_imported_at_startup():
+    result = run_python(f'import sys, son.main; {PRINT_HEAVY_MODULES}')
+
+    assert result.stderr.strip() == ''
+
+
+@pytest.mark.parametrize(
+    ('words', 'command'),
+    [
+        ('son ', 'playlist'),
+        ('son playlist ', 'describe'),
+    ],
+)
+def test_heavy_modules_are_not_imported_by_shell_completion(tmp_path: Path, words: str, command: str):
+    # completing a command name resolves every command of the group to get its short help
+    environment = {
+        **os.environ,
+        'XDG_DATA_HOME': str(tmp_path),
+        '_SON_COMPLETE': 'bash_complete',
+        'COMP_WORDS': words,
+        'COMP_CWORD': str(len(words.split())),
+    }
+    code = 'import sys\nfrom son.main import cli\ntry:\n    cli(prog_name="son")\nexcept SystemExit:\n    pass\n'
+    result = run_python(code + PRINT_HEAVY_MODULES, env=environment)
+
+    assert f'plain,{command}' in result.stdout.splitlines()
+    assert result.stderr.strip() == ''
+
+
+def test_help_lists_lazy_commands():
+    result = CliRunner().invoke(cli, ['--help'])
+
+    assert result.exit_code == 0, result.output
+    assert 'playlist' in result.output
+    assert 'to-wav' in result.output
+
+    result = CliRunner().invoke(cli, ['playlist', '--help'])
+
+    assert result.exit_code == 0, result.output
+    assert 'describe' in result.output
@@ -0,0 +1,65 @@
+import wave
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+from sqlalchemy import select
+
+from son.database import Playlist, PlaylistTrack, Track
+from son.main import Container, cli
+
+
+@pytest.fixture()
+def music(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    monkeypatch.setenv('XDG_DATA_HOME', str(tmp_path / 'data'))
+    music = tmp_path.resolve() / 'music'
+    for folder in ('rock', 'jazz'):
+        (music / folder).mkdir(parents=True)
+        for index in range(2):
+            with wave.open(str(music / folder / f'song-{index}.wav'), 'wb') as file:
+                file.setnchannels(1)
+                file.setsampwidth(2)
+                file.setframerate(8000)
+                file.writeframes(bytes(2 * 8000))
+    return music
+
+
+def run_son(*args: str) -> str:
+    result = CliRunner().invoke(cli, args)
+    assert result.exit_code == 0, result.output
+    return result.output
+
+
+def get_song_names(name: str) -> list[str]:
+    with Container().db.Session() as session:
+        playlist_id = session.execute(select(Playlist.id).where(Playlist.name == name)).scalar_one()
+        statement = select(Track.path).join(PlaylistTrack.track).where(PlaylistTrack.playlist_id == playlist_id)
+        return sorted(Path(path).relative_to(Path(path).parents[1]).as_posix() for path in session.scalars(statement))
+
+
+def test_songs_of_a_missing_folder_are_kept(music: Path):
+    run_son('playlist', 'create', 'mix')
+    run_son('playlist', 'sync', 'mix', '-f', str(music / 'rock'), '-f', str(music / 'jazz'))
+    # like an unmounted drive
+    (music / 'rock').rename(music / 'unmounted')
+    (music / 'jazz' / 'song-0.wav').unlink()
+
+    output = run_son('playlist', 'sync', 'mix')
+
+    assert 'is missing or not readable, its songs are kept' in output
+    assert '0 song(s) added, 0 updated, 1 removed' in output
+    assert get_song_names('mix') == ['jazz/song-1.wav', 'rock/song-0.wav', 'rock/song-1.wav']
+
+
+def test_songs_of_a_folder_available_again_are_updated(music: Path):
+    run_son('playlist', 'create', 'mix')
+    run_son('playlist', 'sync', 'mix', '-f', str(music / 'rock'))
+    (music / 'rock').rename(music / 'unmounted')
+    run_son('playlist', 'sync', 'mix')
+    (music / 'unmounted').rename(music / 'rock')
+    (music / 'rock' / 'song-0.wav').unlink()
+
+    output = run_son('playlist', 'sync', 'mix')
+
+    assert 'not readable' not in output
+    assert get_song_names('mix') == ['rock/song-1.wav']
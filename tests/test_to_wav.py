@@ -0,0 +1,47 @@
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from son.main import cli
+
+
+@pytest.fixture()
+def music(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    # a fake ffmpeg writing the name of the converted file in the output file, its last argument
+    bin_directory = tmp_path / 'bin'
+    bin_directory.mkdir()
+    ffmpeg = bin_directory / 'ffmpeg'
+    ffmpeg.write_text('#!/bin/sh\nfor argument; do output="$argument"; done\necho "$4" > "$output"\n')
+    ffmpeg.chmod(0o755)
+    monkeypatch.setenv('PATH', f'{bin_directory}:/usr/bin:/bin')
+    monkeypatch.setenv('XDG_DATA_HOME', str(tmp_path / 'data'))
+
+    music = tmp_path / 'music'
+    music.mkdir()
+    for name in ('song.mp3', 'song.flac', 'other.mp3'):
+        (music / name).write_bytes(b'audio')
+    return music
+
+
+def test_files_sharing_a_wav_file_are_reported_and_not_converted(music: Path):
+    result = CliRunner().invoke(cli, ['to-wav', str(music), '-j', '2'])
+
+    assert result.exit_code == 1
+    assert '1 file(s) converted' in result.stdout
+    assert '2 file(s) could not be converted' in result.stderr
+    assert 'song.wav would also be created from song.mp3' in result.stderr
+    assert 'song.wav would also be created from song.flac' in result.stderr
+    assert (music / 'other.wav').exists()
+    assert not (music / 'song.wav').exists()
+
+
+def test_colliding_files_are_reported_on_each_run(music: Path):
+    runner = CliRunner()
+    runner.invoke(cli, ['to-wav', str(music)])
+
+    result = runner.invoke(cli, ['to-wav', str(music)])
+
+    assert result.exit_code == 1
+    assert '0 file(s) converted, 1 up to date' in result.stdout
+    assert '2 file(s) could not be converted' in result.stderr